@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TELEGRAM_GLOBAL_RATE = 25  # сообщений в секунду (лимит Telegram ~30, оставляем запас)
+TELEGRAM_PER_CHAT_INTERVAL = 1.0  # секунд между сообщениями в один чат
+
+
+# --- Token bucket: не больше rate отправок в секунду, всплески до capacity ---
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    # После ответа 429 Telegram просит подождать - останавливаем всех отправителей
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+def retry_after_seconds(error):
+    if getattr(error, "error_code", None) != 429:
+        return None
+    result_json = getattr(error, "result_json", None) or {}
+    return result_json.get("parameters", {}).get("retry_after", 1)
+
+
+# --- Массовая рассылка с ограничением скорости, повторами и контрольной точкой ---
+# send(user_id, text) - функция отправки (например, bot.send_message). Каждая доставка (или
+# окончательная ошибка) дописывается в checkpoint_path строкой "broadcast_id,user_id",
+# поэтому после перезапуска рассылка продолжается с того же места без повторных сообщений.
+class Broadcaster:
+    def __init__(self, send, checkpoint_path, workers=4, rate=TELEGRAM_GLOBAL_RATE,
+                 per_chat_interval=TELEGRAM_PER_CHAT_INTERVAL, max_retries=5):
+        self.send = send
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate)
+        self._last_sent = {}  # {user_id: время последней отправки}
+        self._lock = threading.Lock()
+
+    def _load_checkpoint(self, broadcast_id):
+        done = set()
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                for line in f:
+                    line_id, _, user_id = line.strip().rpartition(",")
+                    if line_id == broadcast_id:
+                        done.add(int(user_id))
+        except FileNotFoundError:
+            pass
+        return done
+
+    def _mark_done(self, checkpoint, broadcast_id, user_id):
+        with self._lock:
+            checkpoint.write(f"{broadcast_id},{user_id}\n")
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+    def _wait_per_chat(self, user_id):
+        with self._lock:
+            last_sent = self._last_sent.get(user_id)
+        if last_sent is not None:
+            delay = last_sent + self.per_chat_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _deliver(self, user_id, text):
+        for attempt in range(self.max_retries + 1):
+            self._wait_per_chat(user_id)
+            self.bucket.acquire()
+            try:
+                self.send(user_id, text)
+                with self._lock:
+                    self._last_sent[user_id] = time.monotonic()
+                return True
+            except Exception as e:
+                retry_after = retry_after_seconds(e)
+                if retry_after is not None:
+                    self.bucket.pause(retry_after)
+                elif getattr(e, "error_code", None) is not None:
+                    # Ошибка Telegram (бот заблокирован, чат не найден) - повтор не поможет
+                    print(f"Не удалось отправить сообщение пользователю {user_id}: {e}")
+                    return False
+                else:
+                    # Сетевая ошибка - повторяем с экспоненциальной задержкой
+                    time.sleep(min(2 ** attempt, 30))
+        # Не отмечаем в контрольной точке - после перезапуска попробуем снова
+        print(f"Не удалось отправить сообщение пользователю {user_id} после {self.max_retries + 1} попыток")
+        return None
+
+    def broadcast(self, broadcast_id, user_ids, text):
+        done = self._load_checkpoint(broadcast_id)
+        pending = [user_id for user_id in user_ids if user_id not in done]
+        sent = 0
+        failed = 0
+        with open(self.checkpoint_path, "a") as checkpoint, ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def deliver(user_id):
+                delivered = self._deliver(user_id, text)
+                if delivered is not None:
+                    self._mark_done(checkpoint, broadcast_id, user_id)
+                return delivered
+
+            for delivered in pool.map(deliver, pending):
+                if delivered:
+                    sent += 1
+                else:
+                    failed += 1
+        print(f"Рассылка {broadcast_id}: отправлено {sent}, ошибок {failed}, пропущено ранее отправленных {len(done)}")
+        return sent, failed
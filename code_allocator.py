@@ -0,0 +1,89 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+
+CODE_MIN = 10000
+CODE_MAX = 99999
+_HALF = 300  # 300 * 300 = 90000 = количество 5-значных кодов
+_ROUNDS = 4
+
+
+# --- Выдача уникальных 5-значных кодов без повторных попыток ---
+# Код = CODE_MIN + P(counter), где P - перестановка [0, 90000), заданная сетью Фейстеля с секретным ключом.
+# Перестановка биективна, поэтому коды не повторяются, пока счетчик не дойдет до 90000.
+# Для каждой олимпиады (namespace) свой ключ и свой счетчик; состояние хранится в файле:
+#   namespace,secret_hex,counter
+# При шардировании все шарды берут ключи из общего файла secrets_path, а счетчики ведут в своих файлах:
+# шард offset использует только позиции counter = offset (mod stride), поэтому коды шардов не пересекаются.
+class CodeAllocator:
+    def __init__(self, state_path, secrets_path=None, stride=1, offset=0):
+        self.state_path = state_path
+        self.secrets_path = secrets_path
+        self.stride = stride
+        self.offset = offset
+        self._state = {}  # {namespace: [secret, counter]}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read(path):
+        state = {}
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    namespace, secret, counter = line.strip().rsplit(",", 2)
+                    state[namespace] = [bytes.fromhex(secret), int(counter)]
+        except FileNotFoundError:
+            pass
+        return state
+
+    def load(self):
+        self._state = self._read(self.state_path)
+        if self.secrets_path is not None:
+            # Новый шард продолжает с позиции, до которой дошел общий счетчик (коды до нее уже выданы)
+            for namespace, (secret, counter) in self._read(self.secrets_path).items():
+                if namespace not in self._state:
+                    self._state[namespace] = [secret, counter + (self.offset - counter) % self.stride]
+
+    # Создать ключи заранее (до запуска шардов, чтобы у всех шардов был один ключ на олимпиаду)
+    def ensure_namespaces(self, namespaces):
+        with self._lock:
+            missing = [namespace for namespace in namespaces if namespace not in self._state]
+            for namespace in missing:
+                self._state[namespace] = [secrets.token_bytes(16), 0]
+            if missing:
+                self._save()
+
+    def _save(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for namespace, (secret, counter) in self._state.items():
+                f.write(f"{namespace},{secret.hex()},{counter}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _permute(secret, value):
+        left, right = divmod(value, _HALF)
+        for round_number in range(_ROUNDS):
+            digest = hmac.new(secret, f"{round_number}:{right}".encode(), hashlib.sha256).digest()
+            left, right = right, (left + int.from_bytes(digest[:4], "big")) % _HALF
+        return left * _HALF + right
+
+    # is_taken позволяет пропустить коды, выданные раньше старым генератором (случайные коды)
+    def allocate(self, namespace="default", is_taken=None):
+        with self._lock:
+            if namespace not in self._state:
+                if self.secrets_path is not None:
+                    raise RuntimeError(f"Нет общего ключа кодов для олимпиады {namespace}")
+                self._state[namespace] = [secrets.token_bytes(16), 0]
+            entry = self._state[namespace]
+            while entry[1] < _HALF * _HALF:
+                code = str(CODE_MIN + self._permute(entry[0], entry[1]))
+                entry[1] += self.stride
+                if is_taken is None or not is_taken(code):
+                    self._save()
+                    return code
+            raise RuntimeError(f"Закончились свободные коды для олимпиады {namespace}")
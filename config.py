@@ -0,0 +1,323 @@
+import argparse
+import dataclasses
+import datetime
+import getpass
+import os
+import re
+import sys
+import typing
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+ENV_PREFIX = "OLYMPIAD_"
+CONFIG_PATH_ENV = "OLYMPIAD_CONFIG"
+DEFAULT_CONFIG_FILE = "olympiad.toml"
+DEFAULT_CONTEST_ID = "default"
+CONTEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+REGISTER_PASSWORD_HASH_ENV = "OLYMPIAD_REGISTER_PASSWORD_HASH"
+REGISTER_PASSWORD_HASH_FILE = "register_password.hash"
+
+
+class ConfigError(ValueError):
+    pass
+
+
+# --- Настройки одной олимпиады (предмет, класс, тур) ---
+# Если олимпиад несколько, каждая описывается таблицей [[contests]] в TOML-файле. Пропущенные параметры
+# берутся из общих настроек, а файлы данных по умолчанию получают префикс <contest_id>_.
+@dataclasses.dataclass(frozen=True)
+class ContestConfig:
+    contest_id: str
+    title: str
+    olympiad_start: datetime.datetime
+    olympiad_end: datetime.datetime
+    tasks_file_path: str
+    solution_time_limit_seconds: int
+    solution_folder: str
+    user_data_file: str
+    user_snapshot_file: str
+    user_journal_file: str
+    user_db_file: str
+    register_password_hash: typing.Optional[str] = None
+
+    @classmethod
+    def from_defaults(cls, config, contest_id, **overrides):
+        if contest_id == DEFAULT_CONTEST_ID:
+            prefix = ""
+            solution_folder = config.solution_folder
+        else:
+            prefix = f"{contest_id}_"
+            solution_folder = os.path.join(config.solution_folder, contest_id)
+        values = {
+            "contest_id": contest_id,
+            "title": contest_id,
+            "olympiad_start": config.olympiad_start,
+            "olympiad_end": config.olympiad_end,
+            "tasks_file_path": config.tasks_file_path,
+            "solution_time_limit_seconds": config.solution_time_limit_seconds,
+            "solution_folder": solution_folder,
+            "user_data_file": _prefixed(config.user_data_file, prefix),
+            "user_snapshot_file": _prefixed(config.user_snapshot_file, prefix),
+            "user_journal_file": _prefixed(config.user_journal_file, prefix),
+            "user_db_file": _prefixed(config.user_db_file, prefix),
+            "register_password_hash": config.register_password_hash,
+        }
+        values.update({name: value for name, value in overrides.items() if value is not None})
+        return cls(**values)
+
+    def validate(self):
+        if not CONTEST_ID_PATTERN.match(self.contest_id):
+            raise ConfigError(f"Некорректный contest_id: {self.contest_id!r} (допустимы латинские буквы, цифры, _ и -)")
+        if self.olympiad_start >= self.olympiad_end:
+            raise ConfigError(f"{self.contest_id}: olympiad_start должен быть раньше olympiad_end")
+        if self.solution_time_limit_seconds <= 0:
+            raise ConfigError(f"{self.contest_id}: solution_time_limit_seconds должен быть положительным")
+        return self
+
+
+def _prefixed(path, prefix):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, prefix + name)
+
+
+# Файл данных одного шарда: user_data.txt -> user_data.shard2.txt
+def shard_path(path, shard_index):
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard_index}{ext}"
+
+
+# --- Настройки одного экземпляра бота ---
+# Значения по умолчанию совпадают с прежними константами в коде. Любое поле можно задать в TOML-файле
+# (ключ = имя поля) или переменной окружения OLYMPIAD_<ИМЯ_ПОЛЯ>; окружение важнее файла.
+# Так несколько процессов (разные олимпиады, шарды) запускаются из одного кода с разными файлами настроек.
+@dataclasses.dataclass(frozen=True)
+class BotConfig:
+    bot_token: str = "YOUR_BOT_TOKEN"
+    register_password_hash: typing.Optional[str] = None  # Готовый bcrypt-хеш: python config.py hash-password
+    admin_password: str = "ADMIN_PASSWORD"
+    tasks_file_path: str = "Olympiada/olympiad.pdf"
+    olympiad_start: datetime.datetime = datetime.datetime(2025, 3, 4, 8, 0, 0)
+    olympiad_end: datetime.datetime = datetime.datetime(2025, 3, 8, 8, 0, 0)
+    solution_time_limit_seconds: int = 60 * 60
+    solution_folder: str = "solutions"
+    user_data_file: str = "user_data.txt"  # Текстовый файл старого формата, читается один раз при миграции
+    user_snapshot_file: str = "user_data.snapshot"  # Двоичный снимок участников (см. snapshot.py)
+    user_journal_file: str = "user_data.journal"
+    user_db_file: str = "user_data.db"
+    flush_window_ms: int = 200  # Окно накопления изменений участников перед записью на диск (0 - без задержки)
+    storage_backend: str = "journal"  # "journal" - текстовый снимок + журнал, "sqlite" - база SQLite с индексами
+    code_allocator_file: str = "codes.txt"
+    file_id_cache_file: str = "file_ids.txt"
+    broadcast_checkpoint_file: str = "broadcast_checkpoint.txt"
+    broadcast_workers: int = 4
+    reminder_minutes: typing.Tuple[int, ...] = (30, 10, 5, 1)  # Напоминания таймера: за сколько минут до конца
+    reminder_mode: str = "send"  # "send" - новое сообщение на каждой отметке, "edit" - одно сообщение обновляется
+    max_solution_file_size: int = 20 * 1024 * 1024
+    ingestion_queue_file: str = "ingestion_queue.txt"
+    ingestion_workers: int = 4
+    password_check_workers: int = 4
+    admin_ids_file: str = "admin_ids.txt"
+    organizator_username: str = "erkinzodsaidjon"
+    admin_mode: str = "organizer"  # "organizer" - права по username организатора, "password" - по admin_ids и паролю
+    username_cache_ttl_seconds: int = 24 * 60 * 60
+    conversation_db_file: str = "conversations.db"  # Шаги многошаговых диалогов; общий файл для всех шардов
+    conversation_ttl_seconds: int = 15 * 60  # Через сколько брошенный диалог забывается
+    run_mode: str = "polling"  # "polling" или "webhook"
+    webhook_url: str = "https://example.com/webhook"
+    webhook_host: str = "127.0.0.1"
+    webhook_port: int = 8443
+    webhook_path: str = "/webhook"
+    webhook_secret_token: typing.Optional[str] = None
+    webhook_workers: int = 8
+    log_file: str = "bot.log"
+    shards: int = 1  # Число процессов-обработчиков; участники распределяются по user_id % shards
+    shard_index: int = 0  # Номер шарда текущего процесса (задается при запуске обработчиков)
+    shard_timeout_seconds: int = 10  # Сколько ждать ответа других шардов на команду организатора
+    contests: typing.Tuple[ContestConfig, ...] = ()  # Пусто - одна олимпиада "default" из общих настроек
+
+    # Олимпиады, которые обслуживает процесс
+    def contest_configs(self):
+        if self.contests:
+            return self.contests
+        return (ContestConfig.from_defaults(self, DEFAULT_CONTEST_ID),)
+
+    def validate(self):
+        if not self.bot_token:
+            raise ConfigError("bot_token не задан")
+        if self.olympiad_start >= self.olympiad_end:
+            raise ConfigError("olympiad_start должен быть раньше olympiad_end")
+        for name in ("solution_time_limit_seconds", "broadcast_workers", "max_solution_file_size",
+                     "ingestion_workers", "password_check_workers", "username_cache_ttl_seconds", "conversation_ttl_seconds",
+                     "webhook_workers", "shards", "shard_timeout_seconds"):
+            if getattr(self, name) <= 0:
+                raise ConfigError(f"{name} должен быть положительным")
+        if self.flush_window_ms < 0:
+            raise ConfigError("flush_window_ms не может быть отрицательным")
+        if not 0 <= self.shard_index < self.shards:
+            raise ConfigError(f"shard_index должен быть от 0 до {self.shards - 1}")
+        if not self.reminder_minutes or any(minutes <= 0 for minutes in self.reminder_minutes):
+            raise ConfigError("reminder_minutes должен содержать положительные числа")
+        if self.reminder_mode not in ("send", "edit"):
+            raise ConfigError(f"Неизвестный режим напоминаний: {self.reminder_mode}")
+        if self.storage_backend not in ("journal", "sqlite"):
+            raise ConfigError(f"Неизвестное хранилище данных: {self.storage_backend}")
+        if self.admin_mode not in ("organizer", "password"):
+            raise ConfigError(f"Неизвестный режим прав администратора: {self.admin_mode}")
+        if self.run_mode not in ("polling", "webhook"):
+            raise ConfigError(f"Неизвестный режим запуска: {self.run_mode}")
+        if not 0 < self.webhook_port < 65536:
+            raise ConfigError(f"Некорректный webhook_port: {self.webhook_port}")
+        contest_ids = set()
+        for contest in self.contest_configs():
+            contest.validate()
+            if contest.contest_id in contest_ids:
+                raise ConfigError(f"Олимпиада {contest.contest_id} описана дважды")
+            contest_ids.add(contest.contest_id)
+        return self
+
+
+def _convert(name, field_type, value):
+    optional = typing.get_origin(field_type) is typing.Union
+    if optional:
+        if value is None or value == "":
+            return None
+        field_type = next(t for t in typing.get_args(field_type) if t is not type(None))
+    try:
+        if typing.get_origin(field_type) is tuple:
+            # Список в TOML или строка "30,10,5,1" в переменной окружения
+            item_type = typing.get_args(field_type)[0]
+            items = value.split(",") if isinstance(value, str) else value
+            if not isinstance(items, (list, tuple)):
+                raise ValueError(value)
+            return tuple(_convert(name, item_type, item.strip() if isinstance(item, str) else item)
+                         for item in items)
+        if field_type is datetime.datetime:
+            return value if isinstance(value, datetime.datetime) else datetime.datetime.fromisoformat(value)
+        if field_type is int:
+            if isinstance(value, bool):
+                raise ValueError(value)
+            return int(value)
+        if field_type is str:
+            if not isinstance(value, str):
+                raise ValueError(value)
+            return value
+    except (ValueError, TypeError):  # TypeError - значение TOML другого типа, например дата без времени
+        raise ConfigError(f"Некорректное значение {name}: {value!r}")
+    raise ConfigError(f"Неподдерживаемый тип поля {name}")
+
+
+def load_config(path=None, environ=None):
+    environ = os.environ if environ is None else environ
+    path = path or environ.get(CONFIG_PATH_ENV)
+    values = {}
+    if path is None and os.path.exists(DEFAULT_CONFIG_FILE):
+        path = DEFAULT_CONFIG_FILE
+    if path is not None:
+        if tomllib is None:
+            raise ConfigError("Для чтения TOML нужен Python 3.11+ или пакет tomli")
+        try:
+            with open(path, "rb") as f:
+                values = tomllib.load(f)
+        except FileNotFoundError:
+            raise ConfigError(f"Файл настроек {path} не найден")
+        except tomllib.TOMLDecodeError as e:
+            raise ConfigError(f"Ошибка в файле настроек {path}: {e}")
+
+    contest_tables = values.pop("contests", [])
+    if not isinstance(contest_tables, list):
+        raise ConfigError(f"В {path} contests должен быть списком таблиц [[contests]]")
+    fields = {field.name: field for field in dataclasses.fields(BotConfig)}
+    unknown = set(values) - set(fields)
+    if unknown:
+        raise ConfigError(f"Неизвестные параметры в {path}: {', '.join(sorted(unknown))}")
+
+    hints = typing.get_type_hints(BotConfig)
+    kwargs = {}
+    for name in fields:
+        if name == "contests":
+            continue
+        env_name = ENV_PREFIX + name.upper()
+        if env_name in environ:
+            kwargs[name] = _convert(name, hints[name], environ[env_name])
+        elif name in values:
+            kwargs[name] = _convert(name, hints[name], values[name])
+
+    # Хеш пароля можно по-прежнему хранить в отдельном файле register_password.hash
+    if kwargs.get("register_password_hash") is None:
+        kwargs["register_password_hash"] = load_register_password_hash()
+    config = BotConfig(**kwargs)
+    if contest_tables:
+        config = dataclasses.replace(config, contests=tuple(
+            _load_contest(config, table, path) for table in contest_tables))
+    return config.validate()
+
+
+def _load_contest(config, table, path):
+    if not isinstance(table, dict) or "contest_id" not in table:
+        raise ConfigError(f"В {path} у каждой таблицы [[contests]] должен быть contest_id")
+    hints = typing.get_type_hints(ContestConfig)
+    unknown = set(table) - set(hints)
+    if unknown:
+        raise ConfigError(f"Неизвестные параметры олимпиады {table['contest_id']}: {', '.join(sorted(unknown))}")
+    overrides = {name: _convert(name, hints[name], value) for name, value in table.items()}
+    return ContestConfig.from_defaults(config, **overrides)
+
+
+# --- Загрузка заранее вычисленного bcrypt-хеша пароля регистрации ---
+# Хеш берется из переменной окружения OLYMPIAD_REGISTER_PASSWORD_HASH или из файла register_password.hash.
+# Хешировать пароль при каждом импорте не нужно: хеш создается один раз командой
+#   python config.py hash-password
+def load_register_password_hash(path=REGISTER_PASSWORD_HASH_FILE):
+    password_hash = os.environ.get(REGISTER_PASSWORD_HASH_ENV)
+    if password_hash:
+        return password_hash.strip()
+    try:
+        with open(path, "r") as f:
+            password_hash = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return password_hash or None
+
+
+def require_register_password_hash(password_hash):
+    if password_hash is None:
+        print(f"Не задан хеш пароля регистрации. Установите переменную {REGISTER_PASSWORD_HASH_ENV} "
+              f"или создайте файл {REGISTER_PASSWORD_HASH_FILE} командой: python config.py hash-password")
+        sys.exit(1)
+
+
+def hash_password(password):
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Настройка бота олимпиады")
+    commands = parser.add_subparsers(dest="command", required=True)
+    hash_command = commands.add_parser("hash-password", help="вычислить bcrypt-хеш пароля регистрации")
+    hash_command.add_argument("--output", help=f"записать хеш в файл (например, {REGISTER_PASSWORD_HASH_FILE})")
+    args = parser.parse_args(argv)
+
+    if args.command == "hash-password":
+        password = getpass.getpass("Пароль регистрации: ")
+        if password != getpass.getpass("Повторите пароль: "):
+            print("Пароли не совпадают.")
+            return 1
+        password_hash = hash_password(password)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(password_hash + "\n")
+            print(f"Хеш записан в {args.output}")
+        else:
+            print(password_hash)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+# Корень репозитория - в sys.path для тестов: модули бота лежат в корне, а не в пакете
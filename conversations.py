@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+import time
+
+DEFAULT_CONVERSATION_TTL_SECONDS = 15 * 60
+
+
+# --- Состояние многошаговых диалогов (вместо register_next_step_handler) ---
+# chat_id -> (шаг, contest_id, срок действия) хранится в SQLite, а не в памяти процесса: диалог
+# продолжается после перезапуска бота и на любом процессе-шарде (база общая для всех шардов).
+# Шаг - имя обработчика (см. handlers.register_step), а не сама функция, поэтому его можно сохранить.
+# Брошенные диалоги истекают через ttl_seconds и удаляются purge_expired().
+class ConversationStore:
+    def __init__(self, db_path, ttl_seconds=DEFAULT_CONVERSATION_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()  # Соединение используется потоком бота и потоками проверки паролей
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                chat_id INTEGER PRIMARY KEY,
+                step TEXT NOT NULL,
+                contest_id TEXT,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_conversations_expires_at ON conversations(expires_at);
+        """)
+        self._conn.commit()
+
+    # Следующее сообщение чата обработает шаг step (предыдущий незавершенный шаг заменяется)
+    def expect(self, chat_id, step, contest_id=None):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO conversations (chat_id, step, contest_id, expires_at) "
+                               "VALUES (?, ?, ?, ?)", (chat_id, step, contest_id, time.time() + self.ttl_seconds))
+            self._conn.commit()
+
+    # (step, contest_id) или None, если шага нет или он истек
+    def get(self, chat_id):
+        with self._lock:
+            row = self._conn.execute("SELECT step, contest_id FROM conversations WHERE chat_id = ? AND expires_at > ?",
+                                     (chat_id, time.time())).fetchone()
+        return tuple(row) if row is not None else None
+
+    # Забирает шаг: его выполняет только один обработчик, даже если сообщение пришло в несколько процессов
+    def take(self, chat_id):
+        with self._lock:
+            row = self._conn.execute("SELECT step, contest_id, expires_at FROM conversations WHERE chat_id = ?",
+                                     (chat_id,)).fetchone()
+            if row is None:
+                return None
+            step, contest_id, expires_at = row
+            # Удаляем именно прочитанную запись: если другой процесс успел ее забрать, rowcount = 0
+            deleted = self._conn.execute("DELETE FROM conversations WHERE chat_id = ? AND step = ? AND expires_at = ?",
+                                         (chat_id, step, expires_at)).rowcount
+            self._conn.commit()
+        if not deleted or expires_at <= time.time():
+            return None
+        return step, contest_id
+
+    def cancel(self, chat_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM conversations WHERE chat_id = ?", (chat_id,))
+            self._conn.commit()
+
+    # Удаляет брошенные диалоги, возвращает их число
+    def purge_expired(self):
+        with self._lock:
+            count = self._conn.execute("DELETE FROM conversations WHERE expires_at <= ?", (time.time(),)).rowcount
+            self._conn.commit()
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
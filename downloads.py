@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+import requests
+
+DEFAULT_FILE_URL = "https://api.telegram.org/file/bot{0}/{1}"
+CHUNK_SIZE = 64 * 1024
+
+
+class FileTooLargeError(Exception):
+    pass
+
+
+# --- Запись потока частей во временный файл с атомарным переименованием ---
+# В памяти одновременно находится только одна часть; при превышении max_bytes загрузка прерывается,
+# а недописанный временный файл удаляется, поэтому в dest_path никогда не появляется частичный файл.
+def write_chunks_atomically(chunks, dest_path, max_bytes=None):
+    folder = os.path.dirname(dest_path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".download-", suffix=".part")
+    try:
+        written = 0
+        with os.fdopen(fd, "wb") as tmp_file:
+            for chunk in chunks:
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise FileTooLargeError(f"Файл больше {max_bytes} байт")
+                tmp_file.write(chunk)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, dest_path)
+        return written
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# --- Потоковое скачивание файла Telegram прямо на диск ---
+def download_telegram_file(token, file_path, dest_path, max_bytes=None, file_url=None, proxies=None, timeout=60):
+    url = (file_url or DEFAULT_FILE_URL).format(token, file_path)
+    with requests.get(url, stream=True, timeout=timeout, proxies=proxies) as response:
+        response.raise_for_status()
+        content_length = response.headers.get("Content-Length")
+        if max_bytes is not None and content_length is not None and int(content_length) > max_bytes:
+            raise FileTooLargeError(f"Файл больше {max_bytes} байт")
+        return write_chunks_atomically(response.iter_content(CHUNK_SIZE), dest_path, max_bytes)
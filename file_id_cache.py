@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Ошибка Telegram относится к самому file_id (а не к получателю, например 403 "bot was blocked")
+FILE_ID_ERRORS = ("wrong file identifier", "file reference", "wrong remote file identifier")
+
+
+def is_file_id_error(error):
+    if getattr(error, "error_code", None) != 400:
+        return False
+    description = (getattr(error, "description", None) or str(error)).lower()
+    return any(text in description for text in FILE_ID_ERRORS)
+
+
+# --- Кэш Telegram file_id для файлов, которые бот рассылает много раз ---
+# После первой загрузки файл отправляется по file_id. Запись считается устаревшей, если у файла
+# изменились mtime/размер и при этом изменилось содержимое (sha256).
+# Формат файла состояния: file_id,mtime_ns,size,sha256,path
+class FileIdCache:
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self._entries = {}  # {path: [file_id, mtime_ns, size, sha256]}
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.state_path, "r") as f:
+                for line in f:
+                    file_id, mtime_ns, size, sha256, path = line.rstrip("\n").split(",", 4)
+                    self._entries[path] = [file_id, int(mtime_ns), int(size), sha256]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ошибка при загрузке кэша file_id: {e}")
+            self._entries = {}
+
+    def _save(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for path, (file_id, mtime_ns, size, sha256) in self._entries.items():
+                f.write(f"{file_id},{mtime_ns},{size},{sha256},{path}\n")
+        os.replace(tmp_path, self.state_path)
+
+    # Возвращает file_id или None; FileNotFoundError, если самого файла нет
+    def get(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            file_id, mtime_ns, size, sha256 = entry
+            if (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+                return file_id
+            # Файл трогали - проверяем, изменилось ли содержимое
+            if stat.st_size == size and file_sha256(path) == sha256:
+                entry[1] = stat.st_mtime_ns
+                self._save()
+                return file_id
+            del self._entries[path]
+            self._save()
+            return None
+
+    def put(self, path, file_id):
+        stat = os.stat(path)
+        sha256 = file_sha256(path)
+        with self._lock:
+            self._entries[path] = [file_id, stat.st_mtime_ns, stat.st_size, sha256]
+            self._save()
+
+    def invalidate(self, path):
+        with self._lock:
+            if self._entries.pop(path, None) is not None:
+                self._save()
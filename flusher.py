@@ -0,0 +1,76 @@
+import threading
+
+
+# --- Отложенное сохранение с объединением изменений ---
+# Обработчики только отмечают ключ измененным (mark), а фоновый поток раз в window секунд после первой
+# отметки передает все накопленные ключи в write(keys) одной пачкой. Несколько изменений одного участника
+# за окно дают одну запись, и обработчик не ждет диска. flush() сохраняет все немедленно (остановка бота,
+# запросы, которым нужны только что сохраненные данные). Если write упал, ключи остаются отмеченными
+# и сохраняются в следующем окне.
+class DebouncedFlusher:
+    def __init__(self, write, window=0.2):
+        self.write = write
+        self.window = window
+        self._dirty = set()
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # Пачки пишутся по одной - и фоновым потоком, и flush()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="flusher", daemon=True)
+        self._thread.start()
+
+    # Останавливает поток и сохраняет все, что еще не записано
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def mark(self, key):
+        with self._condition:
+            was_clean = not self._dirty
+            self._dirty.add(key)
+            if was_clean:
+                self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return len(self._dirty)
+
+    def flush(self):
+        with self._write_lock:
+            with self._condition:
+                keys, self._dirty = self._dirty, set()
+            if not keys:
+                return True
+            try:
+                self.write(keys)
+                return True
+            except Exception as e:
+                print(f"Ошибка при сохранении данных ({len(keys)} изменений), повтор при следующем сохранении: {e}")
+                with self._condition:
+                    self._dirty |= keys
+                return False
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._dirty:
+                    self._condition.wait()
+                # Окно накопления: изменения, пришедшие за это время, попадут в ту же пачку.
+                # stop() прерывает ожидание и сам сохраняет накопленное.
+                self._condition.wait_for(lambda: not self._running, timeout=self.window)
+                if not self._running:
+                    return
+            if not self.flush():
+                with self._condition:  # Не повторяем неудачную запись в цикле без паузы
+                    self._condition.wait_for(lambda: not self._running, timeout=self.window)
@@ -0,0 +1,139 @@
+import datetime
+import os
+import queue
+import threading
+import time
+import uuid
+
+
+# --- Постоянная очередь приема решений ---
+# Задание (job) - словарь {"job_id", "user_id", "file_id", "dest_path", "submitted_at", "contest_id"}.
+# Файл очереди - журнал строк:
+#   J,job_id,user_id,file_id,submitted_at,contest_id,dest_path  - задание принято
+#   A,job_id,user_id,file_id,submitted_at,dest_path             - то же в старом формате (без олимпиады)
+#   D,job_id                                                     - задание выполнено (или окончательно не удалось)
+# При запуске невыполненные задания возвращаются в очередь, поэтому перезапуск не теряет решения.
+class IngestionQueue:
+    def __init__(self, path, process, on_failure=None, workers=4, max_attempts=5, non_retryable=()):
+        self.path = path
+        self.process = process  # process(job) - скачать файл; исключение означает неудачную попытку
+        self.on_failure = on_failure  # on_failure(job, error) - после max_attempts неудачных попыток
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.non_retryable = non_retryable  # Исключения, при которых повтор не поможет
+        self._queue = queue.Queue()
+        self._pending = {}  # {job_id: job}
+        self._lock = threading.Lock()
+        self._journal = None
+        self._threads = []
+
+    def load(self):
+        pending = {}
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    values = line.rstrip("\n").split(",", 6 if line.startswith("J,") else 5)
+                    if values[0] in ("A", "J") and len(values) in (6, 7):
+                        if values[0] == "J":
+                            _, job_id, user_id, file_id, submitted_at, contest_id, dest_path = values
+                        else:
+                            _, job_id, user_id, file_id, submitted_at, dest_path = values
+                            contest_id = ""
+                        pending[job_id] = {"job_id": job_id, "user_id": int(user_id), "file_id": file_id,
+                                           "dest_path": dest_path, "contest_id": contest_id or None,
+                                           "submitted_at": datetime.datetime.fromisoformat(submitted_at)}
+                    elif values[0] == "D" and len(values) == 2:
+                        pending.pop(values[1], None)
+        except FileNotFoundError:
+            pass
+
+        # Переписываем журнал, оставляя только невыполненные задания
+        with self._lock:
+            self._pending = pending
+            self._rewrite()
+        for job in pending.values():
+            self._queue.put(job)
+        if pending:
+            print(f"Восстановлено {len(pending)} необработанных решений из очереди.")
+
+    def _rewrite(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for job in self._pending.values():
+                f.write(self._format_added(job))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.path, "a")
+
+    @staticmethod
+    def _format_added(job):
+        return (f"J,{job['job_id']},{job['user_id']},{job['file_id']},"
+                f"{job['submitted_at'].isoformat()},{job.get('contest_id') or ''},{job['dest_path']}\n")
+
+    def _append(self, line):
+        if self._journal is None:
+            self._journal = open(self.path, "a")
+        self._journal.write(line)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def submit(self, user_id, file_id, dest_path, submitted_at, contest_id=None):
+        job = {"job_id": uuid.uuid4().hex, "user_id": user_id, "file_id": file_id,
+               "dest_path": dest_path, "submitted_at": submitted_at, "contest_id": contest_id}
+        with self._lock:
+            self._append(self._format_added(job))
+            self._pending[job["job_id"]] = job
+        self._queue.put(job)
+        return job
+
+    def _complete(self, job):
+        with self._lock:
+            self._pending.pop(job["job_id"], None)
+            if self._pending:
+                self._append(f"D,{job['job_id']}\n")
+            else:
+                self._rewrite()  # Очередь пуста - журнал можно обнулить
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            error = None
+            for attempt in range(self.max_attempts):
+                try:
+                    self.process(job)
+                    error = None
+                    break
+                except Exception as e:
+                    error = e
+                    print(f"Ошибка при сохранении решения пользователя {job['user_id']} (попытка {attempt + 1}): {e}")
+                    if isinstance(e, self.non_retryable):
+                        break
+                    time.sleep(min(2 ** attempt, 30))
+            if error is not None and self.on_failure is not None:
+                try:
+                    self.on_failure(job, error)
+                except Exception as e:
+                    print(f"Ошибка в обработчике неудачного сохранения решения: {e}")
+            self._complete(job)
@@ -0,0 +1,860 @@
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import time
+import os
+import sys
+import logging
+from telebot import asyncio_filters, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_handler_backends import BaseMiddleware, State, StatesGroup
+from telebot.asyncio_storage import StateStorageBase
+from config import ConfigError, load_config, require_register_password_hash
+from conversations import ConversationStore
+from timer_scheduler import AsyncTimerScheduler
+from storage import create_user_store
+from snapshot import SnapshotFormatError
+from participants import REGISTERED, USERNAME_CHECKED, Participant, parse_code, parse_points
+from code_allocator import CodeAllocator
+from file_id_cache import FileIdCache, is_file_id_error
+from broadcast import Broadcaster, retry_after_seconds
+from reminders import ReminderPolicy, format_remaining
+from password_check import PasswordVerifier
+from downloads import FileTooLargeError, download_telegram_file
+
+# --- Асинхронный вариант бота: одна олимпиада, права организатора по username ---
+# Обработчики, таймеры и файловые операции работают в одном цикле событий. Поддерживается не все,
+# что умеет python -m olympiad_bot: несколько олимпиад ([[contests]]), шарды, admin_mode = "password"
+# и webhook здесь не реализованы, и check_supported() отклоняет такие настройки, а не игнорирует их.
+# Импорт модуля ничего не читает и не пишет: настройки и службы создает setup(config) из main().
+UNSUPPORTED_SETTINGS_TEXT = "ol_async.py не поддерживает {}; запустите бота командой python -m olympiad_bot"
+
+
+def check_supported(config):
+    if config.contests:
+        raise ConfigError(UNSUPPORTED_SETTINGS_TEXT.format("несколько олимпиад ([[contests]])"))
+    if config.shards > 1:
+        raise ConfigError(UNSUPPORTED_SETTINGS_TEXT.format("шардирование (shards > 1)"))
+    if config.admin_mode != "organizer":
+        raise ConfigError(UNSUPPORTED_SETTINGS_TEXT.format(f'admin_mode = "{config.admin_mode}"'))
+    if config.run_mode != "polling":
+        raise ConfigError(UNSUPPORTED_SETTINGS_TEXT.format(f'run_mode = "{config.run_mode}"'))
+    return config
+
+
+# --- Состояние диалогов в ConversationStore (вместо StateMemoryStorage) ---
+# Шаг диалога переживает перезапуск и забывается через conversation_ttl_seconds, как в olympiad_bot.
+# Данные шага (set_data) обработчики не используют, поэтому хранится только имя состояния.
+class ConversationStateStorage(StateStorageBase):
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    async def set_state(self, chat_id, user_id, state, **kwargs):
+        self.store.expect(chat_id, state.name if hasattr(state, "name") else state)
+        return True
+
+    async def get_state(self, chat_id, user_id, **kwargs):
+        pending = self.store.get(chat_id)
+        return pending[0] if pending is not None else None
+
+    async def delete_state(self, chat_id, user_id, **kwargs):
+        self.store.cancel(chat_id)
+        return True
+
+    async def get_data(self, chat_id, user_id, **kwargs):
+        return {}
+
+    async def reset_data(self, chat_id, user_id, **kwargs):
+        return True
+
+    async def set_data(self, chat_id, user_id, key, value, **kwargs):
+        raise NotImplementedError("Данные шага в ConversationStateStorage не хранятся")
+
+
+# --- Настройки и общие службы (создаются в setup) ---
+CONFIG = None  # BotConfig
+bot = None
+user_store = None
+code_allocator = None
+password_verifier = None
+file_id_cache = None
+conversations = None
+broadcaster = None  # Рассылки и сообщения таймеров идут через его token bucket
+reminder_policy = None  # Напоминания только на отметках "осталось N минут"
+timer_scheduler = None  # Все таймеры участников в одной задаче asyncio
+tasks_upload_lock = None
+io_executor = None  # Запись на диск по порядку, не блокируя цикл событий
+event_loop = None  # Цикл событий бота: Broadcaster отправляет из своих потоков через него
+
+
+# Многошаговые диалоги - состояния (StatesGroup); текущее состояние чата хранит ConversationStateStorage
+class OlympiadStates(StatesGroup):
+    register_password = State()
+    delete_users = State()
+    task_code = State()
+    solution_code = State()
+    add_points = State()
+    new_admin_id = State()
+
+
+# --- Данные в памяти ---
+registered_users = {}  # {user_id: Participant}
+admin_ids = set()
+username_cache = {}  # {user_id: (username, время получения)}
+code_index = {}  # {code (int): user_id}
+username_index = {}  # {username: user_id}
+
+
+# --- Функция загрузки данных пользователей (снимок + журнал) ---
+def load_user_data():
+    global registered_users
+    try:
+        registered_users = user_store.load()
+    except SnapshotFormatError:
+        raise  # С пустым списком участников бот затер бы их данные при сжатии
+    except Exception as e:
+        print(f"Ошибка при загрузке данных пользователей: {e}")
+        registered_users = {}
+    rebuild_indexes()
+
+
+# --- Функция сохранения изменений одного пользователя (запись выполняется в io_executor) ---
+def save_user_data(user_id):
+    io_executor.submit(write_user_data, user_id)
+
+
+def write_user_data(user_id):
+    try:
+        if user_id in registered_users:
+            user_store.save_user(user_id, registered_users[user_id])
+        else:
+            user_store.delete_user(user_id)
+    except Exception as e:
+        print(f"Ошибка при сохранении данных пользователей: {e}")
+
+
+# --- Индексы code -> user_id и username -> user_id ---
+# Все изменения registered_users проходят через set_user/delete_user/remember_username,
+# чтобы индексы оставались согласованными.
+def index_user(user_id):
+    data = registered_users[user_id]
+    if data.code is not None:
+        code_index[data.code] = user_id
+    if data.username is not None:
+        username_index[data.username] = user_id
+
+
+def unindex_user(user_id):
+    data = registered_users.get(user_id)
+    if data is None:
+        return
+    if code_index.get(data.code) == user_id:
+        del code_index[data.code]
+    if username_index.get(data.username) == user_id:
+        del username_index[data.username]
+
+
+def rebuild_indexes():
+    code_index.clear()
+    username_index.clear()
+    for user_id in registered_users:
+        index_user(user_id)
+
+
+def set_user(user_id, data):
+    unindex_user(user_id)
+    registered_users[user_id] = data
+    index_user(user_id)
+    save_user_data(user_id)
+
+
+def delete_user(user_id):
+    unindex_user(user_id)
+    registered_users.pop(user_id, None)
+    save_user_data(user_id)
+
+
+# --- Функция загрузки ID администраторов ---
+def load_admin_ids():
+    global admin_ids
+    try:
+        with open(CONFIG.admin_ids_file, "r") as f:
+            for line in f:
+                admin_ids.add(int(line.strip()))
+    except FileNotFoundError:
+        print("Файл admin_ids.txt не найден. Создается новый.")
+    except Exception as e:
+        print(f"Ошибка при загрузке ID администраторов: {e}")
+        admin_ids = set()
+
+
+# --- Функция сохранения ID администраторов ---
+def save_admin_ids():
+    try:
+        with open(CONFIG.admin_ids_file, "w") as f:
+            for admin_id in admin_ids:
+                f.write(f"{admin_id}\n")
+    except Exception as e:
+        print(f"Ошибка при сохранении ID администраторов: {e}")
+
+
+# --- Функция генерации уникального 5-значного кода ---
+async def generate_unique_code():
+    # Состояние аллокатора сохраняется на диск, поэтому выдача идет в io_executor
+    return await asyncio.get_running_loop().run_in_executor(
+        io_executor, lambda: int(code_allocator.allocate(is_taken=lambda code: int(code) in code_index)))
+
+
+# --- Чтение файла (вызывается через asyncio.to_thread) ---
+def read_file(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+# --- Кэш username участников ---
+# Username запоминается из каждого входящего сообщения и хранится вместе с участником,
+# поэтому списки для организатора строятся без запросов к Telegram.
+def remember_username(user_id, username):
+    username_cache[user_id] = (username, time.time())
+    if user_id in registered_users and registered_users[user_id].username != username:
+        unindex_user(user_id)
+        registered_users[user_id].username = username
+        index_user(user_id)
+        save_user_data(user_id)
+
+
+async def get_username(user_id):
+    cached = username_cache.get(user_id)
+    if cached is not None and time.time() - cached[1] < CONFIG.username_cache_ttl_seconds:
+        return cached[0]
+    if user_id in registered_users and registered_users[user_id].username is not None:
+        return registered_users[user_id].username
+
+    # Username еще неизвестен (старые записи) - один запрос, результат кэшируется на CONFIG.username_cache_ttl_seconds
+    try:
+        username = (await bot.get_chat(user_id)).username
+    except asyncio_helper.ApiException as e:
+        print(f"Не удалось получить информацию о пользователе {user_id}: {e}")
+        username_cache[user_id] = (None, time.time())
+        return None
+    remember_username(user_id, username)
+    return username
+
+
+class UsernameMiddleware(BaseMiddleware):
+    def __init__(self):
+        super().__init__()
+        self.update_types = ['message']
+
+    async def pre_process(self, message, data):
+        remember_username(message.from_user.id, message.from_user.username)
+
+    async def post_process(self, message, data, exception):
+        pass
+
+
+# --- Функция для форматирования времени до конца олимпиады ---
+def format_timedelta(delta):
+    days = delta.days
+    hours, remainder = divmod(delta.seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{days} дней, {hours} часов, {minutes} минут, {seconds} секунд"
+
+
+# --- Проверка, активен ли таймер ---
+def check_timer(message):
+    user_id = message.from_user.id
+    if user_id in registered_users and registered_users[user_id].timer_active:
+        if message.text == "/help":
+            return False
+        else:
+            return True  # Блокируем все команды, кроме /help
+    return False
+
+
+async def ask(message, text, state):
+    await bot.set_state(message.from_user.id, state, message.chat.id)
+    return await bot.reply_to(message, text)
+
+
+async def finish_step(message):
+    await bot.delete_state(message.from_user.id, message.chat.id)
+
+
+# --- Обработчики команд ---
+async def start(message):
+    if check_timer(message):
+        await bot.reply_to(message, "Во время решения олимпиады вам доступна только команда /help.")
+        return
+    username = message.from_user.username
+    await bot.reply_to(message,
+                       f"Привет, {username}. Рад видеть тебя на этой олимпиаде. Чтобы участвовать в олимпиаде, нажмите /register для регистрации.")
+
+
+async def help(message):
+    await bot.reply_to(message, f"Если у вас есть вопросы, обратитесь к @{CONFIG.organizator_username}.")
+
+
+async def register(message):
+    if check_timer(message):
+        await bot.reply_to(message, "Во время решения олимпиады вам доступна только команда /help.")
+        return
+
+    user_id = message.from_user.id
+    if user_id in registered_users and registered_users[user_id].registered:
+        await bot.reply_to(message, "Вы уже зарегистрированы в олимпиаде.")
+        return
+
+    # Проверка наличия username
+    if message.from_user.username is None:
+        await bot.reply_to(message, "Для регистрации в олимпиаде вам необходимо создать @username в Telegram.\n"
+                                    "Инструкция:\n"
+                                    "1. Откройте Telegram.\n"
+                                    "2. Перейдите в 'Настройки'.\n"
+                                    "3. Найдите поле 'Имя пользователя' и задайте его.")
+        set_user(user_id, Participant())
+        return
+
+    await ask(message, "Введите пароль, который дал организатор:", OlympiadStates.register_password)
+
+
+async def process_register_password(message):
+    user_id = message.from_user.id
+    password = message.text or ""
+    # Проверка идет в пуле потоков, цикл событий не блокируется
+    password_ok = await asyncio.wrap_future(password_verifier.submit(user_id, password))
+    if password_ok is None:
+        await bot.reply_to(message, f"Слишком много неверных попыток. Попробуйте снова через "
+                                    f"{password_verifier.retry_after(user_id)} секунд.")
+    elif password_ok:
+        await finish_step(message)
+        code = await generate_unique_code()
+        set_user(user_id, Participant(code=code, flags=REGISTERED | USERNAME_CHECKED,
+                                      username=message.from_user.username))
+        await bot.reply_to(message,
+                           f"Вы успешно зарегистрировались в этой олимпиаде. Ваш уникальный код: {code}. Чтобы узнать о статусе периода олимпиады нажмите /stat. Для подробной информации и поддержки используйте /help.")
+    else:
+        await bot.reply_to(message, "Пароль неверный. Проверьте пароль и попробуйте еще раз.")
+        await ask(message, "Введите пароль, который дал организатор:", OlympiadStates.register_password)
+
+
+async def stat(message):
+    if check_timer(message):
+        await bot.reply_to(message, "Во время решения олимпиады вам доступна только команда /help.")
+        return
+
+    now = datetime.datetime.now()
+    if now < CONFIG.olympiad_start:
+        time_left = CONFIG.olympiad_start - now
+        await bot.reply_to(message,
+                           "Еще не началась период олимпиады. До начала олимпиады осталось: " + format_timedelta(
+                               time_left) + ". Чтобы узнать о подробностях обратитесь к поддержку /help")
+    elif CONFIG.olympiad_start <= now <= CONFIG.olympiad_end:
+        time_left = CONFIG.olympiad_end - now
+        await bot.reply_to(message,
+                           "Период олимпиады уже начался. До конца периода олимпиады осталось: " + format_timedelta(
+                               time_left) + ". Чтобы получит задачи, нажмите /get_tasks. У вас будет ровно 1 час чтобы отправит решение (в формате pdf; ОБЯЗАТЕЛЬНО).")
+    else:
+        await bot.reply_to(message,
+                           "Период олимпиады уже закончилась. Чтобы узнать о подробностях обратитесь к поддержку /help")
+
+
+async def registered_users_list(message):
+    if message.from_user.username == CONFIG.organizator_username:
+        user_list = ""
+        for user_id, data in list(registered_users.items()):
+            username = await get_username(user_id) or "Не указан"
+            user_list += f"ID: {user_id}, Код: {data.code}, Username: @{username}\n"
+        await bot.reply_to(message, f"Список зарегистрированных пользователей:\n{user_list}")
+    else:
+        await bot.reply_to(message, "У вас нет прав для просмотра этой информации.")
+
+
+async def delete_users(message):
+    if message.from_user.username == CONFIG.organizator_username:
+        await ask(message,
+                  "Чтобы удалить участника олимпиады, отправьте username участников, которых хотите удалить из олимпиады (каждый username на новой строке):",
+                  OlympiadStates.delete_users)
+    else:
+        await bot.reply_to(message, "У вас нет прав для выполнения этой команды.")
+
+
+async def process_delete_users(message):
+    await finish_step(message)
+    usernames = (message.text or "").splitlines()
+    deleted_count = 0
+    for username in usernames:
+        user_id = username_index.get(username.replace("@", ""))
+        if user_id is not None:
+            stop_solution_timer(user_id)
+            delete_user(user_id)
+            deleted_count += 1
+    await bot.reply_to(message, f"Удалено {deleted_count} пользователей.")
+
+
+async def get_tasks(message):
+    if check_timer(message):
+        await bot.reply_to(message, "Во время решения олимпиады вам доступна только команда /help.")
+        return
+
+    user_id = message.from_user.id
+    if user_id not in registered_users or not registered_users[user_id].registered:
+        await bot.reply_to(message,
+                           "Вы не зарегистрированы в олимпиаде. Пожалуйста, зарегистрируйтесь с помощью команды /register.")
+        return
+
+    await ask(message, "Введите ваш индивидуальный код:", OlympiadStates.task_code)
+
+
+async def process_task_code(message):
+    await finish_step(message)
+    user_id = message.from_user.id
+    code = parse_code(message.text)
+    if code is not None and code == registered_users[user_id].code:
+        try:
+            await send_tasks_document(user_id)
+            await bot.reply_to(message, "Задания отправлены. У вас есть 1 час на решение.")
+
+            registered_users[user_id].solution_time = datetime.datetime.now()
+            registered_users[user_id].solution_sent = False
+            registered_users[user_id].timer_active = True
+            save_user_data(user_id)
+
+            start_time = datetime.datetime.now()
+            end_time = start_time + datetime.timedelta(seconds=CONFIG.solution_time_limit_seconds)
+
+            # Запуск таймера в общем планировщике
+            start_solution_timer(user_id, end_time)
+
+        except FileNotFoundError:
+            await bot.reply_to(message, "Файл с заданиями не найден.")
+        except Exception as e:
+            await bot.reply_to(message, f"Произошла ошибка при отправке файла: {e}")
+    else:
+        await bot.reply_to(message, "Вы ввели неверный код. Попробуйте снова или обратитесь в поддержку /help.")
+
+
+# --- Отправка заданий: PDF загружается один раз, дальше отправляется по file_id ---
+async def send_tasks_document(user_id):
+    file_id = await asyncio.to_thread(file_id_cache.get, CONFIG.tasks_file_path)
+    if file_id is not None:
+        try:
+            await bot.send_document(user_id, file_id)
+            return
+        except asyncio_helper.ApiTelegramException as e:
+            # Ошибки получателя (бот заблокирован, чат не найден) не означают, что file_id устарел
+            if not is_file_id_error(e):
+                raise
+            print(f"Не удалось отправить задания по file_id, файл будет загружен заново: {e}")
+            file_id_cache.invalidate(CONFIG.tasks_file_path)
+
+    # Пока идет первая загрузка, остальные участники ждут ее file_id, а не загружают файл параллельно
+    async with tasks_upload_lock:
+        file_id = await asyncio.to_thread(file_id_cache.get, CONFIG.tasks_file_path)
+        if file_id is not None:
+            await bot.send_document(user_id, file_id)
+            return
+        document = await asyncio.to_thread(read_file, CONFIG.tasks_file_path)
+        sent = await bot.send_document(user_id, document, visible_file_name=os.path.basename(CONFIG.tasks_file_path))
+        await asyncio.to_thread(file_id_cache.put, CONFIG.tasks_file_path, sent.document.file_id)
+
+
+def start_solution_timer(user_id, end_time):
+    next_time = reminder_policy.next_time(datetime.datetime.now(), end_time)
+    timer_scheduler.schedule(user_id, next_time.timestamp(), lambda: solution_timer(user_id, end_time))
+
+
+def stop_solution_timer(user_id):
+    timer_scheduler.cancel(user_id)
+
+
+# --- Сообщения таймеров: через token bucket рассылок, чтобы вместе не превышать лимит Telegram ---
+async def send_timer_message(user_id, text):
+    await asyncio.to_thread(broadcaster.bucket.acquire)
+    try:
+        await bot.send_message(user_id, text)
+    except asyncio_helper.ApiTelegramException as e:
+        retry_after = retry_after_seconds(e)
+        if retry_after is None:
+            raise
+        broadcaster.bucket.pause(retry_after)
+        await asyncio.to_thread(broadcaster.bucket.acquire)
+        await bot.send_message(user_id, text)
+
+
+# --- Срабатывание таймера: напоминание на отметке и планирование следующей ---
+async def solution_timer(user_id, end_time):
+    if user_id not in registered_users or not registered_users[user_id].timer_active:
+        return
+
+    now = datetime.datetime.now()
+    if now >= end_time:
+        await expire_solution_timer(user_id)
+        return
+
+    try:
+        await send_timer_message(user_id, f"Таймер (работающий): {format_remaining(end_time - now)}")
+    except asyncio_helper.ApiException as e:
+        print(f"Ошибка при отправке таймера пользователю {user_id}: {e}")
+        # Напоминания больше не шлем, но истечение времени все равно обрабатываем
+        timer_scheduler.schedule(user_id, end_time.timestamp(), lambda: solution_timer(user_id, end_time))
+        return
+
+    next_time = reminder_policy.next_time(now, end_time)
+    timer_scheduler.schedule(user_id, next_time.timestamp(), lambda: solution_timer(user_id, end_time))
+
+
+TIMER_EXPIRED_TEXT = "К сожалению, вы не успели отправить задачу в течение таймера. Чтобы узнать о подробностях, обратитесь в поддержку."
+
+
+async def expire_solution_timer(user_id):
+    # Флаг сохраняется до отправки: уведомление может ждать очереди token bucket
+    registered_users[user_id].timer_active = False
+    save_user_data(user_id)
+    if not registered_users[user_id].solution_sent:
+        try:
+            await send_timer_message(user_id, TIMER_EXPIRED_TEXT)
+        except asyncio_helper.ApiException as e:
+            print(f"Ошибка при отправке уведомления об истечении времени пользователю {user_id}: {e}")
+
+
+# --- Восстановление таймеров после перезапуска ---
+# Идущие таймеры снова ставятся в планировщик (первое напоминание - на ближайшей отметке), таймеры,
+# истекшие за время простоя, закрываются, а уведомления об этом уходят рассылкой с контрольной точкой.
+def restore_timers():
+    now = datetime.datetime.now()
+    limit = datetime.timedelta(seconds=CONFIG.solution_time_limit_seconds)
+    restored = 0
+    notify = []
+    for user_id, data in list(registered_users.items()):
+        if not data.timer_active:
+            continue
+        end_time = data.solution_time + limit if data.solution_time is not None else None
+        if end_time is not None and end_time > now:
+            start_solution_timer(user_id, end_time)
+            restored += 1
+            continue
+        data.timer_active = False
+        save_user_data(user_id)
+        if not data.solution_sent:
+            notify.append(user_id)
+    if notify:
+        broadcast_id = f"expired-{int(now.timestamp())}"
+        asyncio.get_running_loop().create_task(
+            asyncio.to_thread(broadcaster.broadcast, broadcast_id, notify, TIMER_EXPIRED_TEXT))
+    print(f"Восстановлено таймеров {restored}, истекло за время простоя {len(notify)}")
+
+
+async def results(message):
+    if message.from_user.username == CONFIG.organizator_username:
+        users_with_solutions = dict(user_store.users_with_solutions())
+
+        if not users_with_solutions:
+            await bot.reply_to(message, "Никто еще не отправил решения.")
+            return
+
+        codes_list = "\n".join(f"Код: {code}" for code in users_with_solutions.values())
+        await ask(message, f"Список кодов участников, отправивших решения:\n{codes_list}\n\n"
+                           "Чтобы посмотреть решение участника, отправьте его индивидуальный код:",
+                  OlympiadStates.solution_code)
+    else:
+        await bot.reply_to(message, "У вас нет прав для выполнения этой команды.")
+
+
+async def process_solution_code(message):
+    await finish_step(message)
+    code = parse_code(message.text)
+    user_id = code_index.get(code)
+    if user_id is not None and not registered_users[user_id].solution_sent:
+        user_id = None
+
+    if user_id is None:
+        await bot.reply_to(message, "Неверный код или участник не отправлял решение.")
+        return
+
+    try:
+        solution_file = os.path.join(CONFIG.solution_folder, f"@{await get_username(user_id)}-result.pdf")
+        try:
+            document = await asyncio.to_thread(read_file, solution_file)
+        except FileNotFoundError:
+            await bot.reply_to(message, "Решение для этого пользователя не найдено.")
+            return
+        await bot.send_document(message.chat.id, document, caption=f"Решение пользователя с кодом: {code}",
+                                visible_file_name=os.path.basename(solution_file))
+    except asyncio_helper.ApiException as e:
+        print(f"Ошибка при отправке решения пользователю {user_id}: {e}")
+    except Exception as e:
+        logging.error(f"Error processing solution code: {e}")
+        await bot.reply_to(message, f"Произошла ошибка при обработке запроса: {e}")
+
+
+async def result_olymp(message):
+    if message.from_user.username == CONFIG.organizator_username:
+        users_list = "\n".join(
+            [f"Код: {data.code}, Username: @{await get_username(user_id)}" for user_id, data in
+             list(registered_users.items()) if data.registered])
+        await ask(message, f"Список участников:\n{users_list}\n\n"
+                           "Чтобы добавить баллы участника, отправьте данные следующим образом:\n"
+                           "@username - [20] балл",
+                  OlympiadStates.add_points)
+    else:
+        await bot.reply_to(message, "У вас нет прав для выполнения этой команды.")
+
+
+async def process_add_points(message):
+    await finish_step(message)
+    try:
+        username, points = parse_points(message.text)
+
+        user_id = username_index.get(username)
+        if user_id is None:
+            await bot.reply_to(message, "Пользователь с таким username не найден.")
+            return
+
+        registered_users[user_id].points = points  # Сохраняем баллы
+        save_user_data(user_id)  # Сохраняем данные в журнал
+
+        await bot.reply_to(message, f"Баллы для пользователя @{username} успешно добавлены: {points}")
+
+    except Exception as e:
+        await bot.reply_to(message, "Ошибка формата. Пример: @username - [20] балл")
+        logging.error(f"Error processing add points: {e}")
+
+
+async def list_balls(message):
+    if message.from_user.username == CONFIG.organizator_username:
+        users_with_points = "\n".join(
+            [f"@{await get_username(user_id)} - {points} балл(ов)"
+             for user_id, points in user_store.users_with_points()]
+        )
+        if users_with_points:
+            await bot.reply_to(message, f"Список участников с баллами:\n{users_with_points}")
+        else:
+            await bot.reply_to(message, "Пока нет участников с баллами.")
+    else:
+        await bot.reply_to(message, "У вас нет прав для выполнения этой команды.")
+
+
+# --- Прием решений ---
+def too_large_text():
+    return f"Файл слишком большой. Максимальный размер решения: {CONFIG.max_solution_file_size // (1024 * 1024)} МБ."
+
+
+async def handle_document(message):
+    user_id = message.from_user.id
+    # Время отправки берем из сообщения, а не из момента обработки
+    now = datetime.datetime.fromtimestamp(message.date)
+
+    # Проверяем, находится ли текущее время в диапазоне проведения олимпиады
+    if not (CONFIG.olympiad_start <= now <= CONFIG.olympiad_end):
+        await bot.reply_to(message, "Сейчас не время для отправки решений. Пожалуйста, дождитесь начала/окончания олимпиады.")
+        return
+
+    if user_id not in registered_users or not registered_users[user_id].registered:
+        await bot.reply_to(message, "Вы не зарегистрированы в олимпиаде. Пожалуйста, зарегистрируйтесь.")
+        return
+
+    # Решение принимается, если задания получены и файл отправлен до конца таймера (по времени сообщения,
+    # даже если таймер уже закрыт планировщиком)
+    if registered_users[user_id].solution_time is not None:
+        # Дополнительная проверка на формат файла (PDF)
+        if message.document.file_name.endswith(".pdf"):
+            if registered_users[user_id].solution_sent:
+                await bot.reply_to(message, "Вы уже отправили решение.")
+                return
+
+            if message.document.file_size is not None and message.document.file_size > CONFIG.max_solution_file_size:
+                await bot.reply_to(message, too_large_text())
+                return
+
+            time_difference = now - registered_users[user_id].solution_time
+            if time_difference.total_seconds() > CONFIG.solution_time_limit_seconds:
+                await bot.reply_to(message,
+                                   "К сожалению, вы не успели отправить задачу в течение таймера. Чтобы узнать о подробностях, обратитесь в поддержку.")
+                registered_users[user_id].timer_active = False
+                stop_solution_timer(user_id)
+                save_user_data(user_id)
+                return
+
+            try:
+                file_info = await bot.get_file(message.document.file_id)
+
+                username = message.from_user.username  # Username отправителя уже есть в сообщении
+                solution_start_time = registered_users[user_id].solution_time  # Запоминаем время начала решения
+
+                # Save the file with a unique name based on username
+                file_name = f"@{username}-result.pdf"  # Имя файла = username пользователя
+                file_path = os.path.join(CONFIG.solution_folder, file_name)
+                # Файл пишется частями во временный файл и атомарно переименовывается
+                await asyncio.to_thread(download_telegram_file, CONFIG.bot_token, file_info.file_path, file_path,
+                                        CONFIG.max_solution_file_size, file_url=asyncio_helper.FILE_URL,
+                                        proxies=asyncio_helper.proxy and {"https": asyncio_helper.proxy})
+
+                registered_users[user_id].solution_sent = True
+                registered_users[user_id].timer_active = False
+                stop_solution_timer(user_id)
+                save_user_data(user_id)
+
+                solution_time = now - solution_start_time
+                solution_time_str = str(solution_time).split(".")[0]  # Убираем микросекунды
+
+                await bot.reply_to(message,
+                                   f"Получили вашу работу. Проверяем вашу работу и обязательно сообщим вам. Вы решали задачу в течение {solution_time_str}.")
+
+            except FileTooLargeError:
+                await bot.reply_to(message, too_large_text())
+            except Exception as e:
+                await bot.reply_to(message, f"Произошла ошибка при обработке файла: {e}")
+                registered_users[user_id].timer_active = False
+                stop_solution_timer(user_id)
+                save_user_data(user_id)
+        else:
+            await bot.reply_to(message, "Пожалуйста, отправьте решение в формате PDF.")
+    else:
+        await bot.reply_to(message, "Сначала получите задания и начните выполнение, чтобы отправить решение.")
+        return
+
+# --- Обработчик добавления админа ---
+async def add_admin(message):
+    user_id = message.from_user.id
+    if user_id not in admin_ids:
+        await bot.reply_to(message, "У вас нет прав для выполнения этой команды.")
+        return
+    await ask(message, "Введите ID пользователя, которого хотите сделать админом:", OlympiadStates.new_admin_id)
+
+
+async def process_new_admin_id(message):
+    await finish_step(message)
+    try:
+        new_admin_id = int(message.text)
+        admin_ids.add(new_admin_id)
+        await asyncio.to_thread(save_admin_ids)
+        await bot.reply_to(message, f"Пользователь с ID {new_admin_id} теперь админ.")
+    except ValueError:
+        await bot.reply_to(message, "Некорректный ID пользователя. Введите число.")
+
+
+# --- Обработчик всех текстовых сообщений (для блокировки команд во время таймера) ---
+async def echo_all(message):
+    if check_timer(message):
+        await bot.reply_to(message, "Во время решения олимпиады вам доступна только команда /help.")
+        return
+
+
+# --- Уведомление о начале олимпиады ---
+# Broadcaster работает в потоках, поэтому отправка передается обратно в цикл событий
+def send_from_thread(user_id, text):
+    return asyncio.run_coroutine_threadsafe(bot.send_message(user_id, text), event_loop).result()
+
+
+async def announce_olympiad_start():
+    await asyncio.to_thread(broadcaster.broadcast, f"start-{CONFIG.olympiad_start.isoformat()}",
+                            list(registered_users), "Олимпиада началась!")
+
+
+def schedule_start_announcement():
+    if datetime.datetime.now() > CONFIG.olympiad_end:
+        return
+    # Если бот запущен уже после начала, рассылка стартует сразу; контрольная точка не даст отправить повторно
+    timer_scheduler.schedule("olympiad_start", CONFIG.olympiad_start.timestamp(), announce_olympiad_start)
+
+
+# --- Удаление брошенных диалогов; повторяется раз в conversation_ttl_seconds ---
+async def purge_conversations():
+    try:
+        count = await asyncio.to_thread(conversations.purge_expired)
+        if count:
+            print(f"Удалено брошенных диалогов: {count}")
+    except Exception as e:
+        print(f"Ошибка при удалении брошенных диалогов: {e}")
+    timer_scheduler.schedule("purge_conversations", time.time() + CONFIG.conversation_ttl_seconds,
+                             purge_conversations)
+
+
+# --- Регистрация обработчиков (порядок важен: telebot проверяет их по очереди) ---
+def register_handlers():
+    bot.add_custom_filter(asyncio_filters.StateFilter(bot))
+    bot.setup_middleware(UsernameMiddleware())
+    bot.register_message_handler(start, commands=['start'])
+    bot.register_message_handler(help, commands=['help'])
+    bot.register_message_handler(register, commands=['register'])
+    bot.register_message_handler(process_register_password, state=OlympiadStates.register_password)
+    bot.register_message_handler(stat, commands=['stat'])
+    bot.register_message_handler(registered_users_list, commands=['registered_users'])
+    bot.register_message_handler(delete_users, commands=['delete_users'])
+    bot.register_message_handler(process_delete_users, state=OlympiadStates.delete_users)
+    bot.register_message_handler(get_tasks, commands=['get_tasks'])
+    bot.register_message_handler(process_task_code, state=OlympiadStates.task_code)
+    bot.register_message_handler(results, commands=['results'])
+    bot.register_message_handler(process_solution_code, state=OlympiadStates.solution_code)
+    bot.register_message_handler(result_olymp, commands=['result_olymp'])
+    bot.register_message_handler(process_add_points, state=OlympiadStates.add_points)
+    bot.register_message_handler(list_balls, commands=['list_balls'])
+    bot.register_message_handler(handle_document, content_types=['document'])
+    bot.register_message_handler(add_admin, commands=['add_admin'])
+    bot.register_message_handler(process_new_admin_id, state=OlympiadStates.new_admin_id)
+    bot.register_message_handler(echo_all, func=lambda message: True, content_types=['text'])
+
+
+# --- Создание служб и загрузка данных ---
+def setup(config):
+    global CONFIG, bot, user_store, code_allocator, password_verifier, file_id_cache, conversations, broadcaster
+    global reminder_policy, timer_scheduler, tasks_upload_lock, io_executor
+    CONFIG = check_supported(config)
+    logging.basicConfig(filename=config.log_file, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    conversations = ConversationStore(config.conversation_db_file, config.conversation_ttl_seconds)
+    bot = AsyncTeleBot(config.bot_token, state_storage=ConversationStateStorage(conversations))
+    user_store = create_user_store(config.storage_backend, config.user_snapshot_file, config.user_journal_file,
+                                   config.user_db_file, legacy_path=config.user_data_file)
+    code_allocator = CodeAllocator(config.code_allocator_file)
+    password_verifier = PasswordVerifier(config.register_password_hash, workers=config.password_check_workers)
+    file_id_cache = FileIdCache(config.file_id_cache_file)
+    broadcaster = Broadcaster(send_from_thread, config.broadcast_checkpoint_file, workers=config.broadcast_workers)
+    reminder_policy = ReminderPolicy(config.reminder_minutes)
+    timer_scheduler = AsyncTimerScheduler()
+    tasks_upload_lock = asyncio.Lock()
+    io_executor = ThreadPoolExecutor(max_workers=1)
+    register_handlers()
+
+    load_user_data()
+    load_admin_ids()
+    code_allocator.load()
+    file_id_cache.load()
+
+
+# --- Запуск бота ---
+async def run_bot():
+    global event_loop
+    event_loop = asyncio.get_running_loop()
+    timer_scheduler.start()
+    restore_timers()
+    schedule_start_announcement()
+    await purge_conversations()
+
+    try:
+        await bot.polling(non_stop=True)
+    finally:
+        await timer_scheduler.stop()
+        io_executor.shutdown(wait=True)
+        user_store.close()
+        conversations.close()
+
+
+def main():
+    try:
+        config = check_supported(load_config())
+    except ConfigError as e:
+        print(f"Ошибка в настройках: {e}")
+        return 1
+    require_register_password_hash(config.register_password_hash)
+    setup(config)
+    asyncio.run(run_bot())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,4 @@
+from olympiad_bot.app import OlympiadBot, create_bot
+from olympiad_bot.handlers import HANDLER_SETS, MODE_HANDLER_SETS
+
+__all__ = ["OlympiadBot", "create_bot", "HANDLER_SETS", "MODE_HANDLER_SETS"]
@@ -0,0 +1,32 @@
+import dataclasses
+import logging
+import sys
+
+from config import ConfigError, load_config, require_register_password_hash
+from olympiad_bot.app import create_bot
+
+
+# --- Запуск бота: python -m olympiad_bot ---
+# overrides - поля BotConfig, которые точка входа задает жестко (например, admin_mode в code1.py)
+def main(**overrides):
+    try:
+        config = load_config()
+        if overrides:
+            config = dataclasses.replace(config, **overrides).validate()
+    except ConfigError as e:
+        print(f"Ошибка в настройках: {e}")
+        return 1
+
+    logging.basicConfig(filename=config.log_file, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    require_register_password_hash(config.register_password_hash)
+    if config.shards > 1:
+        from olympiad_bot.sharding import ShardedBot
+        ShardedBot(config).run()
+    else:
+        create_bot(config).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
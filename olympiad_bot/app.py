@@ -0,0 +1,299 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import telebot
+from telebot import types
+
+from config import shard_path
+from timer_scheduler import TimerScheduler
+from conversations import ConversationStore
+from flusher import DebouncedFlusher
+from code_allocator import CodeAllocator
+from file_id_cache import FileIdCache
+from broadcast import TELEGRAM_GLOBAL_RATE, Broadcaster
+from reminders import ReminderPolicy, ReminderSender
+from downloads import FileTooLargeError, download_telegram_file
+from ingestion import IngestionQueue
+from webhook_server import WebhookServer
+from olympiad_bot.contest import Contest
+from olympiad_bot.handlers import handler_sets_for_mode, register_handler_sets
+
+# Операции, которые другие шарды могут запросить у этого процесса (см. fan_out)
+CONTEST_OPERATIONS = {"participant_rows", "users_with_solutions", "users_with_points", "solution_owner",
+                      "delete_by_usernames", "set_points"}
+BOT_OPERATIONS = {"add_admin_id"}
+
+
+# --- Процесс бота: общие службы и все олимпиады, которые он обслуживает ---
+# Конструктор не обращается ни к диску, ни к сети: данные читает load(), потоки запускает run().
+# Поэтому бот можно создать в тестах с поддельным объектом bot и вызывать обработчики напрямую.
+class OlympiadBot:
+    def __init__(self, config, bot):
+        self.config = config
+        self.bot = bot
+        self.shard = None  # ShardLink, если процесс - один из шардов (см. olympiad_bot.sharding)
+
+        # --- Данные в памяти, общие для всех олимпиад ---
+        self.admin_ids = set()
+        self.username_cache = {}  # {user_id: (username, время получения)}
+        self.selected_contests = {}  # {user_id: contest_id} - выбор командой /contest
+        self.steps = {}  # {имя шага диалога: обработчик} - заполняют наборы обработчиков (см. handlers.register_step)
+        self.conversations = None  # ConversationStore, создается в load()
+
+        # --- Общие службы ---
+        self.timer_scheduler = TimerScheduler()  # Один поток на все таймеры всех олимпиад
+        # Изменения участников всех олимпиад пишутся пачкой раз в окно; ключ - (contest_id, user_id)
+        self.flusher = DebouncedFlusher(self.write_dirty, config.flush_window_ms / 1000)
+        if config.shards > 1:
+            # Общие ключи перестановки, у каждого шарда свои позиции счетчика
+            self.code_allocator = CodeAllocator(shard_path(config.code_allocator_file, config.shard_index),
+                                                secrets_path=config.code_allocator_file,
+                                                stride=config.shards, offset=config.shard_index)
+        else:
+            self.code_allocator = CodeAllocator(config.code_allocator_file)  # Пространство кодов - contest_id
+        self.password_pool = ThreadPoolExecutor(max_workers=config.password_check_workers, thread_name_prefix="bcrypt")
+        self.file_id_cache = FileIdCache(config.file_id_cache_file)
+        self.tasks_upload_lock = threading.Lock()
+        # Лимит Telegram общий для токена, поэтому шарды делят его поровну
+        self.broadcaster = Broadcaster(bot.send_message, config.broadcast_checkpoint_file,
+                                       workers=config.broadcast_workers, rate=TELEGRAM_GLOBAL_RATE / config.shards)
+        # Напоминания таймеров идут через тот же token bucket, что и рассылки
+        self.reminder_policy = ReminderPolicy(config.reminder_minutes)
+        self.reminder_sender = ReminderSender(bot.send_message, bot.edit_message_text, bucket=self.broadcaster.bucket,
+                                              workers=config.broadcast_workers,
+                                              edit_in_place=config.reminder_mode == "edit")
+        self.ingestion_queue = IngestionQueue(config.ingestion_queue_file, self.ingest_solution,
+                                              self.ingest_solution_failed, workers=config.ingestion_workers,
+                                              non_retryable=(FileTooLargeError,))
+
+        self.contests = {contest_config.contest_id: Contest(self, contest_config)
+                         for contest_config in config.contest_configs()}
+
+    # --- Загрузка данных при старте бота ---
+    def load(self):
+        if self.conversations is None:
+            self.conversations = ConversationStore(self.config.conversation_db_file, self.config.conversation_ttl_seconds)
+        for contest in self.contests.values():
+            contest.load()
+        self.load_admin_ids()
+        self.code_allocator.load()
+        self.file_id_cache.load()
+
+    # --- Функция загрузки ID администраторов ---
+    def load_admin_ids(self):
+        try:
+            with open(self.config.admin_ids_file, "r") as f:
+                for line in f:
+                    self.admin_ids.add(int(line.strip()))
+        except FileNotFoundError:
+            print(f"Файл {self.config.admin_ids_file} не найден. Создается новый.")
+        except Exception as e:
+            print(f"Ошибка при загрузке ID администраторов: {e}")
+            self.admin_ids = set()
+
+    # --- Функция сохранения ID администраторов ---
+    def save_admin_ids(self):
+        try:
+            with open(self.config.admin_ids_file, "w") as f:
+                for admin_id in self.admin_ids:
+                    f.write(f"{admin_id}\n")
+        except Exception as e:
+            print(f"Ошибка при сохранении ID администраторов: {e}")
+
+    def add_admin_id(self, admin_id):
+        self.admin_ids.add(admin_id)
+
+    # --- Запрос ко всем шардам ---
+    # Возвращает список ответов (по одному на шард); без шардирования - список из одного ответа.
+    # contest_id=None - операция самого бота (BOT_OPERATIONS), иначе - операция олимпиады.
+    def fan_out(self, contest_id, operation, *args):
+        if self.shard is None:
+            return [self.run_operation(contest_id, operation, args)]
+        return self.shard.fan_out(contest_id, operation, args)
+
+    def run_operation(self, contest_id, operation, args):
+        if contest_id is None:
+            if operation not in BOT_OPERATIONS:
+                raise ValueError(f"Неизвестная операция: {operation}")
+            return getattr(self, operation)(*args)
+        if operation not in CONTEST_OPERATIONS:
+            raise ValueError(f"Неизвестная операция: {operation}")
+        return getattr(self.contests[contest_id], operation)(*args)
+
+    # --- Выбор олимпиады для пользователя ---
+    # Явный выбор (/contest) важнее всего; иначе - единственная олимпиада процесса, единственная, где
+    # пользователь зарегистрирован, или единственная идущая сейчас. None - нужно выбрать командой /contest.
+    def contest_for(self, user_id):
+        contest_id = self.selected_contests.get(user_id)
+        if contest_id is not None:
+            return self.contests[contest_id]
+        if len(self.contests) == 1:
+            return next(iter(self.contests.values()))
+        registered = [contest for contest in self.contests.values() if contest.is_registered(user_id)]
+        if len(registered) == 1:
+            return registered[0]
+        if not registered:
+            now = datetime.datetime.now()
+            running = [contest for contest in self.contests.values() if contest.is_running(now)]
+            if len(running) == 1:
+                return running[0]
+        return None
+
+    def select_contest(self, user_id, contest_id):
+        if contest_id not in self.contests:
+            return None
+        self.selected_contests[user_id] = contest_id
+        return self.contests[contest_id]
+
+    # Олимпиада, в которой у пользователя сейчас идет таймер
+    def active_contest(self, user_id):
+        for contest in self.contests.values():
+            if contest.timer_active(user_id):
+                return contest
+        return None
+
+    # --- Кэш username участников ---
+    # Username запоминается из каждого входящего сообщения и хранится вместе с участником,
+    # поэтому списки для организатора строятся без запросов к Telegram.
+    def remember_username(self, user_id, username):
+        self.username_cache[user_id] = (username, time.time())
+        for contest in self.contests.values():
+            contest.remember_username(user_id, username)
+
+    def get_username(self, user_id):
+        cached = self.username_cache.get(user_id)
+        if cached is not None and time.time() - cached[1] < self.config.username_cache_ttl_seconds:
+            return cached[0]
+        for contest in self.contests.values():
+            data = contest.registered_users.get(user_id)
+            if data is not None and data.username is not None:
+                return data.username
+
+        # Username еще неизвестен (старые записи) - один запрос, результат кэшируется на username_cache_ttl_seconds
+        try:
+            username = self.bot.get_chat(user_id).username
+        except telebot.apihelper.ApiException as e:
+            print(f"Не удалось получить информацию о пользователе {user_id}: {e}")
+            self.username_cache[user_id] = (None, time.time())
+            return None
+        self.remember_username(user_id, username)
+        return username
+
+    # Организатор: в режиме "organizer" - по username, в режиме "password" - любой админ из admin_ids
+    def is_organizer(self, message):
+        if self.config.admin_mode == "password":
+            return message.from_user.id in self.admin_ids
+        return message.from_user.username == self.config.organizator_username
+
+    # --- Проверка, активен ли таймер ---
+    def check_timer(self, message):
+        if self.active_contest(message.from_user.id) is not None:
+            if message.text == "/help":
+                return False
+            else:
+                return True  # Блокируем все команды, кроме /help
+        return False
+
+    # --- Прием решений ---
+    # Скачивание принятого решения (выполняется в потоках очереди)
+    def ingest_solution(self, job):
+        file_info = self.bot.get_file(job["file_id"])
+        # Файл пишется частями во временный файл и атомарно переименовывается
+        download_telegram_file(self.config.bot_token, file_info.file_path, job["dest_path"],
+                               self.config.max_solution_file_size,
+                               file_url=telebot.apihelper.FILE_URL, proxies=telebot.apihelper.proxy)
+
+    def ingest_solution_failed(self, job, error):
+        # Задания старого формата (до нескольких олимпиад) относятся к олимпиаде по умолчанию
+        contest = self.contests.get(job.get("contest_id") or next(iter(self.contests)))
+        if contest is not None:
+            contest.ingest_solution_failed(job, error)
+
+    # --- Режим webhook ---
+    def process_webhook_update(self, json_string):
+        self.bot.process_new_updates([types.Update.de_json(json_string)])
+
+    def run_webhook(self):
+        config = self.config
+        # Обработчики выполняются прямо в потоках сервера, отдельный пул telebot не нужен
+        self.bot.threaded = False
+        server = WebhookServer(self.process_webhook_update, host=config.webhook_host, port=config.webhook_port,
+                               path=config.webhook_path, secret_token=config.webhook_secret_token,
+                               workers=config.webhook_workers)
+        self.bot.remove_webhook()
+        self.bot.set_webhook(url=config.webhook_url, secret_token=config.webhook_secret_token)
+        server.serve_forever()
+
+    # --- Удаление брошенных диалогов; повторяется раз в conversation_ttl_seconds ---
+    def purge_conversations(self):
+        try:
+            count = self.conversations.purge_expired()
+            if count:
+                print(f"Удалено брошенных диалогов: {count}")
+        except Exception as e:
+            print(f"Ошибка при удалении брошенных диалогов: {e}")
+        self.timer_scheduler.schedule("purge_conversations", time.time() + self.config.conversation_ttl_seconds,
+                                      self.purge_conversations)
+
+    # Пачка отложенных изменений от DebouncedFlusher: по одной записи в хранилище каждой олимпиады
+    def write_dirty(self, keys):
+        by_contest = {}
+        for contest_id, user_id in keys:
+            by_contest.setdefault(contest_id, []).append(user_id)
+        for contest_id, user_ids in by_contest.items():
+            self.contests[contest_id].write_dirty(user_ids)
+
+    # --- Запуск бота ---
+    # Загрузка данных и фоновые службы; обновления подает run() или процесс-распределитель шардов
+    def start(self):
+        self.load()
+        for contest in self.contests.values():
+            contest.restore_timers()
+            contest.schedule_start_announcement()
+        self.purge_conversations()
+        self.timer_scheduler.start()
+        self.flusher.start()
+        self.reminder_sender.start()
+        self.ingestion_queue.load()
+        self.ingestion_queue.start()
+
+    # --- Остановка: дописываем отложенные изменения и закрываем хранилища ---
+    # Сначала останавливаются службы, которые меняют участников (таймеры, очередь приема решений,
+    # проверка паролей), - иначе их изменения после flusher.stop() не попали бы на диск.
+    def stop(self):
+        self.timer_scheduler.stop()
+        self.ingestion_queue.stop()
+        self.password_pool.shutdown(wait=True)
+        self.reminder_sender.stop()
+        self.flusher.stop()
+        for contest in self.contests.values():
+            contest.close()
+        if self.conversations is not None:
+            self.conversations.close()
+
+    def run(self):
+        self.start()
+        try:
+            if self.config.run_mode == "webhook":
+                self.run_webhook()
+            else:
+                self.bot.polling(none_stop=True)
+        finally:
+            self.stop()
+
+
+def create_bot(config, bot=None, handler_sets=None):
+    """Создает бота олимпиады и регистрирует обработчики.
+
+    bot - готовый объект TeleBot (или его подделка в тестах); по умолчанию создается из config.bot_token.
+    handler_sets - имена наборов обработчиков из handlers.HANDLER_SETS; по умолчанию набор выбирается
+    по config.admin_mode. Ни файлы, ни сеть здесь не используются - данные загружает OlympiadBot.run().
+    """
+    if bot is None:
+        telebot.apihelper.ENABLE_MIDDLEWARE = True  # Нужно для запоминания username из каждого сообщения
+        bot = telebot.TeleBot(config.bot_token)
+    app = OlympiadBot(config, bot)
+    register_handler_sets(app, handler_sets if handler_sets is not None else handler_sets_for_mode(config.admin_mode))
+    return app
@@ -0,0 +1,348 @@
+import datetime
+import os
+import threading
+
+import telebot
+
+from config import DEFAULT_CONTEST_ID
+from storage import create_user_store
+from file_id_cache import is_file_id_error
+from snapshot import SnapshotFormatError
+from participants import ParticipantTable
+from password_check import PasswordVerifier
+from reminders import format_remaining
+
+TIMER_EXPIRED_TEXT = "К сожалению, вы не успели отправить задачу в течение таймера. Чтобы узнать о подробностях, обратитесь в поддержку."
+
+
+# --- Одна олимпиада: участники, коды, файл заданий и таймеры ---
+# Бот, планировщик, очередь приема решений, рассылка и пул bcrypt общие для всех олимпиад процесса
+# (см. OlympiadBot), поэтому таймеры ставятся в общий планировщик с ключом (contest_id, user_id).
+class Contest:
+    def __init__(self, app, config, user_store=None):
+        self.app = app
+        self.config = config  # ContestConfig
+        self.contest_id = config.contest_id
+
+        # --- Данные в памяти ---
+        # Изменения участника - под registered_users.lock(user_id), см. ParticipantTable
+        self.registered_users = ParticipantTable()  # {user_id: Participant}
+        self.code_index = {}  # {code (int): user_id}
+        self.username_index = {}  # {username: user_id}
+
+        self.user_store = user_store  # Создается в load(), если не передано заранее
+        self.password_verifier = PasswordVerifier(config.register_password_hash, executor=app.password_pool)
+
+    @property
+    def bot(self):
+        return self.app.bot
+
+    def load(self):
+        if self.user_store is None:
+            self.user_store = create_user_store(self.app.config.storage_backend, self.config.user_snapshot_file,
+                                                self.config.user_journal_file, self.config.user_db_file,
+                                                legacy_path=self.config.user_data_file)
+        self.load_user_data()
+
+    # --- Функция загрузки данных пользователей (снимок + журнал) ---
+    # Ошибку формата снимка не прячем: с пустым списком участников бот затер бы их данные при сжатии
+    def load_user_data(self):
+        try:
+            self.registered_users.replace(self.user_store.load())
+        except SnapshotFormatError:
+            raise
+        except Exception as e:
+            print(f"Ошибка при загрузке данных пользователей олимпиады {self.contest_id}: {e}")
+            self.registered_users.replace({})
+        self.rebuild_indexes()
+
+    # --- Функция сохранения изменений одного пользователя ---
+    # Только отмечает участника измененным: запись в хранилище делает DebouncedFlusher пачкой раз в окно
+    # (см. OlympiadBot.write_dirty), поэтому обработчик не ждет fsync.
+    def save_user_data(self, user_id):
+        self.app.flusher.mark((self.contest_id, user_id))
+
+    # Пишет накопленные изменения одной пачкой. Каждая запись копируется под блокировкой участника,
+    # чтобы в хранилище не попало состояние на середине изменения. None - участник удален.
+    def write_dirty(self, user_ids):
+        changes = []
+        for user_id in user_ids:
+            with self.registered_users.lock(user_id):
+                data = self.registered_users.get(user_id)
+                changes.append((user_id, data.copy() if data is not None else None))
+        self.user_store.apply_changes(changes)
+
+    # --- Индексы code -> user_id и username -> user_id ---
+    # Все изменения registered_users проходят через set_user/delete_user/remember_username,
+    # чтобы индексы оставались согласованными.
+    def index_user(self, user_id):
+        data = self.registered_users[user_id]
+        if data.code is not None:
+            self.code_index[data.code] = user_id
+        if data.username is not None:
+            self.username_index[data.username] = user_id
+
+    def unindex_user(self, user_id):
+        data = self.registered_users.get(user_id)
+        if data is None:
+            return
+        if self.code_index.get(data.code) == user_id:
+            del self.code_index[data.code]
+        if self.username_index.get(data.username) == user_id:
+            del self.username_index[data.username]
+
+    def rebuild_indexes(self):
+        self.code_index.clear()
+        self.username_index.clear()
+        for user_id, _ in self.registered_users.items():
+            self.index_user(user_id)
+
+    def set_user(self, user_id, data):
+        with self.registered_users.lock(user_id):
+            self.unindex_user(user_id)
+            self.registered_users[user_id] = data
+            self.index_user(user_id)
+            self.save_user_data(user_id)
+
+    def delete_user(self, user_id):
+        with self.registered_users.lock(user_id):
+            self.unindex_user(user_id)
+            self.registered_users.pop(user_id, None)
+            self.save_user_data(user_id)
+
+    def remember_username(self, user_id, username):
+        with self.registered_users.lock(user_id):
+            data = self.registered_users.get(user_id)
+            if data is not None and data.username != username:
+                self.unindex_user(user_id)
+                data.username = username
+                self.index_user(user_id)
+                self.save_user_data(user_id)
+
+    def is_registered(self, user_id):
+        data = self.registered_users.get(user_id)
+        return data is not None and data.registered
+
+    def timer_active(self, user_id):
+        data = self.registered_users.get(user_id)
+        return data is not None and data.timer_active
+
+    def is_running(self, now):
+        return self.config.olympiad_start <= now <= self.config.olympiad_end
+
+    # --- Запросы организатора ---
+    # Возвращают простые данные (списки, числа), чтобы при шардировании их можно было выполнить
+    # в каждом процессе-шарде и объединить ответы (см. OlympiadBot.fan_out).
+    def participant_rows(self):
+        return [(user_id, data.code, data.username, data.registered)
+                for user_id, data in self.registered_users.snapshot()]
+
+    # Запросы к хранилищу: сначала дописываем отложенные изменения, чтобы ответ их учитывал
+    def users_with_solutions(self):
+        self.app.flusher.flush()
+        return list(self.user_store.users_with_solutions())
+
+    # (user_id, username, points): username берется из данных шарда участника, как в participant_rows
+    def users_with_points(self):
+        self.app.flusher.flush()
+        rows = []
+        for user_id, points in self.user_store.users_with_points():
+            data = self.registered_users.get(user_id)
+            rows.append((user_id, data.username if data is not None else None, points))
+        return rows
+
+    # (user_id, username) участника с этим кодом, если он отправил решение
+    def solution_owner(self, code):
+        user_id = self.code_index.get(code)
+        data = self.registered_users.get(user_id) if user_id is not None else None
+        if data is None or not data.solution_sent:
+            return None
+        return user_id, data.username
+
+    def delete_by_usernames(self, usernames):
+        deleted_count = 0
+        for username in usernames:
+            user_id = self.username_index.get(username)
+            if user_id is not None:
+                self.stop_solution_timer(user_id)
+                self.delete_user(user_id)
+                deleted_count += 1
+        return deleted_count
+
+    def set_points(self, username, points):
+        user_id = self.username_index.get(username)
+        if user_id is None:
+            return False
+        with self.registered_users.lock(user_id):
+            data = self.registered_users.get(user_id)
+            if data is None:
+                return False
+            data.points = points  # Сохраняем баллы
+            self.save_user_data(user_id)  # Сохраняем данные в журнал
+        return True
+
+    # --- Функция генерации уникального 5-значного кода ---
+    # У каждой олимпиады свой ключ перестановки и счетчик в общем CodeAllocator
+    def generate_unique_code(self):
+        # Пропускаются только коды, выданные раньше случайным генератором
+        return int(self.app.code_allocator.allocate(namespace=self.contest_id,
+                                                    is_taken=lambda code: int(code) in self.code_index))
+
+    # --- Отправка заданий: PDF загружается один раз, дальше отправляется по file_id ---
+    def send_tasks_document(self, user_id):
+        tasks_file_path = self.config.tasks_file_path
+        file_id_cache = self.app.file_id_cache
+        file_id = file_id_cache.get(tasks_file_path)
+        if file_id is not None:
+            try:
+                self.bot.send_document(user_id, file_id)
+                return
+            except telebot.apihelper.ApiTelegramException as e:
+                # Ошибки получателя (бот заблокирован, чат не найден) не означают, что file_id устарел
+                if not is_file_id_error(e):
+                    raise
+                print(f"Не удалось отправить задания по file_id, файл будет загружен заново: {e}")
+                file_id_cache.invalidate(tasks_file_path)
+
+        # Пока идет первая загрузка, остальные участники ждут ее file_id, а не загружают файл параллельно
+        with self.app.tasks_upload_lock:
+            file_id = file_id_cache.get(tasks_file_path)
+            if file_id is not None:
+                self.bot.send_document(user_id, file_id)
+                return
+            with open(tasks_file_path, 'rb') as file:
+                sent = self.bot.send_document(user_id, file)
+            file_id_cache.put(tasks_file_path, sent.document.file_id)
+
+    # --- Таймеры участников ---
+    def timer_key(self, user_id):
+        return (self.contest_id, user_id)
+
+    # Первое срабатывание - на ближайшей отметке напоминаний (сколько всего времени, участник уже знает)
+    def start_solution_timer(self, user_id, end_time):
+        next_time = self.app.reminder_policy.next_time(datetime.datetime.now(), end_time)
+        self.app.timer_scheduler.schedule(self.timer_key(user_id), next_time.timestamp(),
+                                          lambda: self.solution_timer(user_id, end_time))
+
+    def stop_solution_timer(self, user_id):
+        self.app.timer_scheduler.cancel(self.timer_key(user_id))
+        self.app.reminder_sender.forget(user_id)
+
+    # --- Восстановление таймеров после перезапуска ---
+    # Один проход по участникам: идущие таймеры ставятся в планировщик одной операцией (первое напоминание -
+    # на ближайшей отметке, а не сразу всем), таймеры, истекшие за время простоя, закрываются одной записью
+    # в хранилище, а уведомления об этом уходят рассылкой с ограничением скорости.
+    def restore_timers(self):
+        now = datetime.datetime.now()
+        limit = datetime.timedelta(seconds=self.config.solution_time_limit_seconds)
+        entries = []
+        expired = []
+        for user_id, data in self.registered_users.snapshot():
+            if not data.timer_active:
+                continue
+            if data.solution_time is None:
+                expired.append(user_id)  # Таймер без времени начала восстановить нельзя
+                continue
+            end_time = data.solution_time + limit
+            if end_time <= now:
+                expired.append(user_id)
+                continue
+            next_time = self.app.reminder_policy.next_time(now, end_time)
+            entries.append((self.timer_key(user_id), next_time.timestamp(),
+                            lambda user_id=user_id, end_time=end_time: self.solution_timer(user_id, end_time)))
+        if entries:
+            self.app.timer_scheduler.schedule_many(entries)
+
+        if expired:
+            closed = []
+            for user_id in expired:
+                with self.registered_users.lock(user_id):
+                    data = self.registered_users.get(user_id)
+                    if data is not None:
+                        data.timer_active = False
+                        closed.append((user_id, data.copy()))
+            try:
+                self.user_store.save_users(closed)
+            except Exception as e:
+                print(f"Ошибка при сохранении данных пользователей олимпиады {self.contest_id}: {e}")
+            notify = [user_id for user_id, data in closed if not data.solution_sent]
+            if notify:
+                broadcast_id = f"expired-{self.contest_id}-{int(now.timestamp())}"
+                threading.Thread(target=self.app.broadcaster.broadcast, args=(broadcast_id, notify, TIMER_EXPIRED_TEXT),
+                                 daemon=True).start()
+        print(f"Олимпиада {self.contest_id}: восстановлено таймеров {len(entries)}, истекло за время простоя {len(expired)}")
+
+    # --- Срабатывание таймера: напоминание на отметке и планирование следующей ---
+    # Само сообщение отправляет общий ReminderSender пачками с ограничением скорости.
+    def solution_timer(self, user_id, end_time):
+        if not self.timer_active(user_id):
+            return
+
+        now = datetime.datetime.now()
+        if now >= end_time:
+            self.expire_solution_timer(user_id)
+            return
+
+        self.app.reminder_sender.submit(user_id, f"Таймер (работающий): {format_remaining(end_time - now)}")
+        next_time = self.app.reminder_policy.next_time(now, end_time)
+        self.app.timer_scheduler.schedule(self.timer_key(user_id), next_time.timestamp(),
+                                          lambda: self.solution_timer(user_id, end_time))
+
+    # Уведомление уходит через ReminderSender новым сообщением (forget сбрасывает сообщение-таймер),
+    # поэтому одновременно истекшие таймеры не задерживают поток планировщика
+    def expire_solution_timer(self, user_id):
+        with self.registered_users.lock(user_id):
+            data = self.registered_users.get(user_id)
+            # Решение могло быть принято, пока срабатывал таймер
+            if data is None or not data.timer_active:
+                return
+            self.app.reminder_sender.forget(user_id)
+            if not data.solution_sent:
+                self.app.reminder_sender.submit(user_id, TIMER_EXPIRED_TEXT)
+            data.timer_active = False
+            self.save_user_data(user_id)
+
+    # --- Прием решений ---
+    def solution_path(self, username):
+        return os.path.join(self.config.solution_folder, f"@{username}-result.pdf")
+
+    # Файл так и не удалось скачать - просим отправить заново, если время еще осталось
+    def ingest_solution_failed(self, job, error):
+        user_id = job["user_id"]
+        with self.registered_users.lock(user_id):
+            data = self.registered_users.get(user_id)
+            if data is None:
+                return
+            data.solution_sent = False
+            end_time = data.solution_time + datetime.timedelta(seconds=self.config.solution_time_limit_seconds)
+            if datetime.datetime.now() < end_time:
+                data.timer_active = True
+                self.start_solution_timer(user_id, end_time)
+                text = "Не удалось сохранить ваш файл. Пожалуйста, отправьте решение еще раз."
+            else:
+                text = f"Не удалось сохранить ваш файл. Обратитесь в поддержку /help. ({error})"
+            self.save_user_data(user_id)
+        try:
+            self.bot.send_message(user_id, text)
+        except telebot.apihelper.ApiException as e:
+            print(f"Ошибка при отправке уведомления пользователю {user_id}: {e}")
+
+    # --- Уведомление о начале олимпиады ---
+    def announce_start(self):
+        start = self.config.olympiad_start.isoformat()
+        # Идентификатор рассылки единственной олимпиады не изменился, чтобы не повторять уже отправленное
+        broadcast_id = f"start-{start}" if self.contest_id == DEFAULT_CONTEST_ID else f"start-{self.contest_id}-{start}"
+        text = "Олимпиада началась!" if self.contest_id == DEFAULT_CONTEST_ID else f"Олимпиада «{self.config.title}» началась!"
+        self.app.broadcaster.broadcast(broadcast_id, self.registered_users.user_ids(), text)
+
+    def schedule_start_announcement(self):
+        if datetime.datetime.now() > self.config.olympiad_end:
+            return
+        # Если бот запущен уже после начала, рассылка стартует сразу; контрольная точка не даст отправить повторно.
+        # Сама рассылка идет в отдельном потоке, чтобы не задерживать таймеры участников.
+        self.app.timer_scheduler.schedule(("olympiad_start", self.contest_id), self.config.olympiad_start.timestamp(),
+                                          lambda: threading.Thread(target=self.announce_start, daemon=True).start())
+
+    def close(self):
+        if self.user_store is not None:
+            self.user_store.close()
@@ -0,0 +1,578 @@
+import datetime
+import hmac
+import logging
+import os
+
+import telebot
+
+from participants import REGISTERED, USERNAME_CHECKED, Participant, parse_code, parse_points
+
+TIMER_ACTIVE_TEXT = "Во время решения олимпиады вам доступна только команда /help."
+NO_RIGHTS_TEXT = "У вас нет прав для выполнения этой команды."
+
+
+# --- Функция для форматирования времени до конца олимпиады ---
+def format_timedelta(delta):
+    days = delta.days
+    hours, remainder = divmod(delta.seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{days} дней, {hours} часов, {minutes} минут, {seconds} секунд"
+
+
+# --- Список олимпиад процесса для выбора командой /contest ---
+def format_contests(app):
+    lines = []
+    for contest in app.contests.values():
+        config = contest.config
+        lines.append(f"{contest.contest_id} - {config.title} "
+                     f"({config.olympiad_start:%d.%m.%Y %H:%M} - {config.olympiad_end:%d.%m.%Y %H:%M})")
+    return "\n".join(lines)
+
+
+def choose_contest_text(app):
+    return ("Выберите олимпиаду командой /contest <код олимпиады>:\n" + format_contests(app))
+
+
+# Олимпиада, к которой относится команда; если ее не определить, пользователь получает список для выбора
+def require_contest(app, message):
+    contest = app.contest_for(message.from_user.id)
+    if contest is None:
+        app.bot.reply_to(message, choose_contest_text(app))
+    return contest
+
+
+# --- Многошаговые диалоги ---
+# Вместо bot.register_next_step_handler шаг сохраняется в app.conversations по имени: следующее
+# сообщение чата обработает зарегистрированный под этим именем обработчик, даже после перезапуска
+# или на другом процессе-шарде. Обработчик шага получает (message, contest) или (message,), если
+# шаг не относится к олимпиаде.
+def register_step(app, name, handler):
+    app.steps[name] = handler
+
+
+def expect_step(app, message, name, contest=None):
+    app.conversations.expect(message.chat.id, name, contest.contest_id if contest is not None else None)
+
+
+# Регистрируется первым: как и next step handler в telebot, ожидаемый шаг забирает следующее
+# сообщение чата раньше команд и остальных обработчиков.
+def register_step_dispatcher(app):
+    bot = app.bot
+
+    @bot.message_handler(func=lambda message: app.conversations.get(message.chat.id) is not None,
+                         content_types=telebot.util.content_type_media)
+    def continue_conversation(message):
+        pending = app.conversations.take(message.chat.id)
+        if pending is None:
+            return  # Шаг уже истек или его забрало другое сообщение
+        step, contest_id = pending
+        handler = app.steps.get(step)
+        if handler is None:
+            print(f"Неизвестный шаг диалога {step} в чате {message.chat.id}")
+            return
+        if contest_id is None:
+            handler(message)
+            return
+        contest = app.contests.get(contest_id)
+        if contest is None:
+            bot.reply_to(message, choose_contest_text(app))  # Олимпиаду убрали из настроек
+            return
+        handler(message, contest)
+
+
+# --- Команды участника: регистрация, задания, прием решений ---
+def register_participant_handlers(app):
+    bot = app.bot
+    config = app.config
+
+    @bot.middleware_handler(update_types=['message'])
+    def track_username(bot_instance, message):
+        app.remember_username(message.from_user.id, message.from_user.username)
+
+    @bot.message_handler(commands=['contest'])
+    def contest_command(message):
+        if app.check_timer(message):
+            bot.reply_to(message, TIMER_ACTIVE_TEXT)
+            return
+        args = (message.text or "").split(maxsplit=1)
+        if len(args) < 2:
+            bot.reply_to(message, choose_contest_text(app))
+            return
+        contest = app.select_contest(message.from_user.id, args[1].strip())
+        if contest is None:
+            bot.reply_to(message, "Олимпиада не найдена. " + choose_contest_text(app))
+            return
+        bot.reply_to(message, f"Выбрана олимпиада «{contest.config.title}». Для регистрации нажмите /register.")
+
+    @bot.message_handler(commands=['start'])
+    def start(message):
+        if app.check_timer(message):
+            bot.reply_to(message, TIMER_ACTIVE_TEXT)
+            return
+        username = message.from_user.username
+        bot.reply_to(message,
+                     f"Привет, {username}. Рад видеть тебя на этой олимпиаде. Чтобы участвовать в олимпиаде, нажмите /register для регистрации.")
+
+    @bot.message_handler(commands=['help'])
+    def help(message):
+        bot.reply_to(message, f"Если у вас есть вопросы, обратитесь к @{config.organizator_username}.")
+
+    @bot.message_handler(commands=['register'])
+    def register(message):
+        if app.check_timer(message):
+            bot.reply_to(message, TIMER_ACTIVE_TEXT)
+            return
+        contest = require_contest(app, message)
+        if contest is None:
+            return
+
+        user_id = message.from_user.id
+        if contest.is_registered(user_id):
+            bot.reply_to(message, "Вы уже зарегистрированы в олимпиаде.")
+            return
+
+        # Проверка наличия username
+        if message.from_user.username is None:
+            bot.reply_to(message, "Для регистрации в олимпиаде вам необходимо создать @username в Telegram.\n"
+                                  "Инструкция:\n"
+                                  "1. Откройте Telegram.\n"
+                                  "2. Перейдите в 'Настройки'.\n"
+                                  "3. Найдите поле 'Имя пользователя' и задайте его.")
+            contest.set_user(user_id, Participant())
+            return
+
+        bot.reply_to(message, "Введите пароль, который дал организатор:")
+        expect_step(app, message, "register_password", contest)
+
+    def process_register_password(message, contest):
+        user_id = message.from_user.id
+        password = message.text or ""
+        # Проверка идет в пуле потоков, ответ отправляется по ее завершении
+        future = contest.password_verifier.submit(user_id, password)
+        future.add_done_callback(lambda f: on_password_checked(message, contest, f))
+
+    # Вызывается в потоке пула bcrypt: исключение отсюда попало бы только во внутренний лог
+    # concurrent.futures, поэтому ошибку сообщаем участнику и снова ждем пароль
+    def on_password_checked(message, contest, future):
+        try:
+            finish_register_password(message, contest, future.result())
+        except Exception as e:
+            logging.error(f"Error processing register password: {e}")
+            try:
+                if not contest.is_registered(message.from_user.id):
+                    expect_step(app, message, "register_password", contest)
+                bot.reply_to(message, "Произошла ошибка при проверке пароля. Попробуйте ввести пароль еще раз.")
+            except Exception as e:
+                logging.error(f"Error reporting register password failure: {e}")
+
+    def finish_register_password(message, contest, password_ok):
+        user_id = message.from_user.id
+        if password_ok is None:
+            bot.reply_to(message, f"Слишком много неверных попыток. Попробуйте снова через "
+                                  f"{contest.password_verifier.retry_after(user_id)} секунд.")
+            expect_step(app, message, "register_password", contest)
+        elif password_ok:
+            code = contest.generate_unique_code()
+            contest.set_user(user_id, Participant(code=code, flags=REGISTERED | USERNAME_CHECKED,
+                                                  username=message.from_user.username))
+            bot.reply_to(message,
+                         f"Вы успешно зарегистрировались в этой олимпиаде. Ваш уникальный код: {code}. Чтобы узнать о статусе периода олимпиады нажмите /stat. Для подробной информации и поддержки используйте /help.")
+        else:
+            bot.reply_to(message, "Пароль неверный. Проверьте пароль и попробуйте еще раз.")
+            bot.reply_to(message, "Введите пароль, который дал организатор:")
+            expect_step(app, message, "register_password", contest)
+
+    register_step(app, "register_password", process_register_password)
+
+    @bot.message_handler(commands=['stat'])
+    def stat(message):
+        if app.check_timer(message):
+            bot.reply_to(message, TIMER_ACTIVE_TEXT)
+            return
+        contest = require_contest(app, message)
+        if contest is None:
+            return
+
+        now = datetime.datetime.now()
+        contest_config = contest.config
+        if now < contest_config.olympiad_start:
+            time_left = contest_config.olympiad_start - now
+            bot.reply_to(message,
+                         "Еще не началась период олимпиады. До начала олимпиады осталось: " + format_timedelta(
+                             time_left) + ". Чтобы узнать о подробностях обратитесь к поддержку /help")
+        elif contest.is_running(now):
+            time_left = contest_config.olympiad_end - now
+            bot.reply_to(message,
+                         "Период олимпиады уже начался. До конца периода олимпиады осталось: " + format_timedelta(
+                             time_left) + ". Чтобы получит задачи, нажмите /get_tasks. У вас будет ровно 1 час чтобы отправит решение (в формате pdf; ОБЯЗАТЕЛЬНО).")
+        else:
+            bot.reply_to(message,
+                         "Период олимпиады уже закончилась. Чтобы узнать о подробностях обратитесь к поддержку /help")
+
+    @bot.message_handler(commands=['get_tasks'])
+    def get_tasks(message):
+        if app.check_timer(message):
+            bot.reply_to(message, TIMER_ACTIVE_TEXT)
+            return
+        contest = require_contest(app, message)
+        if contest is None:
+            return
+
+        user_id = message.from_user.id
+        if not contest.is_registered(user_id):
+            bot.reply_to(message,
+                         "Вы не зарегистрированы в олимпиаде. Пожалуйста, зарегистрируйтесь с помощью команды /register.")
+            return
+
+        bot.reply_to(message, "Введите ваш индивидуальный код:")
+        expect_step(app, message, "task_code", contest)
+
+    def process_task_code(message, contest):
+        user_id = message.from_user.id
+        code = parse_code(message.text)
+        data = contest.registered_users.get(user_id)
+        if data is None:
+            bot.reply_to(message, "Вы не зарегистрированы в олимпиаде. Пожалуйста, зарегистрируйтесь с помощью команды /register.")
+            return
+        if code is not None and code == data.code:
+            try:
+                contest.send_tasks_document(user_id)
+                bot.reply_to(message, "Задания отправлены. У вас есть 1 час на решение.")
+
+                with contest.registered_users.lock(user_id):
+                    data.solution_time = datetime.datetime.now()
+                    data.solution_sent = False
+                    data.timer_active = True
+                    contest.save_user_data(user_id)
+
+                    end_time = data.solution_time + datetime.timedelta(seconds=contest.config.solution_time_limit_seconds)
+
+                    # Запуск таймера в общем планировщике
+                    contest.start_solution_timer(user_id, end_time)
+
+            except FileNotFoundError:
+                bot.reply_to(message, "Файл с заданиями не найден.")
+            except Exception as e:
+                bot.reply_to(message, f"Произошла ошибка при отправке файла: {e}")
+        else:
+            bot.reply_to(message, "Вы ввели неверный код. Попробуйте снова или обратитесь в поддержку /help.")
+
+    register_step(app, "task_code", process_task_code)
+
+    def too_large_text():
+        return f"Файл слишком большой. Максимальный размер решения: {config.max_solution_file_size // (1024 * 1024)} МБ."
+
+    # Решение не принято - таймер участника останавливается (вызывается под блокировкой участника)
+    def reject_solution(contest, user_id, text):
+        contest.registered_users[user_id].timer_active = False
+        contest.stop_solution_timer(user_id)
+        contest.save_user_data(user_id)
+        return text
+
+    @bot.message_handler(content_types=['document'])
+    def handle_document(message):
+        user_id = message.from_user.id
+        # Время отправки берем из сообщения, а не из момента обработки - так очередь не влияет на дедлайн
+        now = datetime.datetime.fromtimestamp(message.date)
+
+        # Решение относится к олимпиаде, в которой идет таймер
+        contest = app.active_contest(user_id) or require_contest(app, message)
+        if contest is None:
+            return
+
+        # Проверяем, находится ли текущее время в диапазоне проведения олимпиады
+        if not contest.is_running(now):
+            bot.reply_to(message, "Сейчас не время для отправки решений. Пожалуйста, дождитесь начала/окончания олимпиады.")
+            return
+
+        # Проверка и прием решения - под блокировкой участника, чтобы два файла подряд или
+        # одновременное срабатывание таймера не приняли решение дважды. Ответ отправляется после.
+        with contest.registered_users.lock(user_id):
+            text = accept_solution(message, contest, user_id, now)
+        bot.reply_to(message, text)
+
+    # Возвращает текст ответа участнику
+    def accept_solution(message, contest, user_id, now):
+        data = contest.registered_users.get(user_id)
+        if data is None or not data.registered:
+            return "Вы не зарегистрированы в олимпиаде. Пожалуйста, зарегистрируйтесь."
+
+        # Решение принимается, если задания получены и файл отправлен до конца таймера. timer_active не
+        # проверяем: под нагрузкой планировщик может закрыть таймер раньше, чем обработано сообщение,
+        # отправленное вовремя, - срок считаем по времени сообщения.
+        if data.solution_time is None:
+            return "Сначала получите задания и начните выполнение, чтобы отправить решение."
+
+        # Дополнительная проверка на формат файла (PDF)
+        if not message.document.file_name.endswith(".pdf"):
+            return "Пожалуйста, отправьте решение в формате PDF."
+
+        if data.solution_sent:
+            return "Вы уже отправили решение."
+
+        if message.document.file_size is not None and message.document.file_size > config.max_solution_file_size:
+            return too_large_text()
+
+        time_difference = now - data.solution_time
+        if time_difference.total_seconds() > contest.config.solution_time_limit_seconds:
+            return reject_solution(contest, user_id,
+                                   "К сожалению, вы не успели отправить задачу в течение таймера. Чтобы узнать о подробностях, обратитесь в поддержку.")
+
+        try:
+            # Имя файла = username отправителя, он уже есть в сообщении
+            file_path = contest.solution_path(message.from_user.username)
+
+            # Решение считается принятым сразу, скачивание выполняют потоки очереди
+            app.ingestion_queue.submit(user_id, message.document.file_id, file_path, now, contest.contest_id)
+
+            data.solution_sent = True
+            data.timer_active = False
+            contest.stop_solution_timer(user_id)
+            contest.save_user_data(user_id)
+
+            solution_time_str = str(time_difference).split(".")[0]  # Убираем микросекунды
+            return f"Получили вашу работу. Проверяем вашу работу и обязательно сообщим вам. Вы решали задачу в течение {solution_time_str}."
+
+        except Exception as e:
+            return reject_solution(contest, user_id, f"Произошла ошибка при обработке файла: {e}")
+
+
+# --- Список и удаление участников для организатора (по его username) ---
+def register_organizer_handlers(app):
+    bot = app.bot
+
+    @bot.message_handler(commands=['registered_users'])
+    def registered_users_list(message):
+        if not app.is_organizer(message):
+            bot.reply_to(message, "У вас нет прав для просмотра этой информации.")
+            return
+        contest = require_contest(app, message)
+        if contest is not None:
+            bot.reply_to(message, f"Список зарегистрированных пользователей:\n{format_registered_users(app, contest)}")
+
+    @bot.message_handler(commands=['delete_users'])
+    def delete_users(message):
+        if not app.is_organizer(message):
+            bot.reply_to(message, NO_RIGHTS_TEXT)
+            return
+        contest = require_contest(app, message)
+        if contest is None:
+            return
+        bot.reply_to(message,
+                     "Чтобы удалить участника олимпиады, отправьте username участников, которых хотите удалить из олимпиады (каждый username на новой строке):")
+        expect_step(app, message, "delete_users", contest)
+
+    def process_delete_users(message, contest):
+        usernames = [username.replace("@", "") for username in (message.text or "").splitlines()]
+        deleted_count = sum(app.fan_out(contest.contest_id, "delete_by_usernames", usernames))
+        bot.reply_to(message, f"Удалено {deleted_count} пользователей.")
+
+    register_step(app, "delete_users", process_delete_users)
+
+
+# --- Список участников для админа с паролем администратора (вариант без организатора) ---
+def register_admin_password_handlers(app):
+    bot = app.bot
+    config = app.config
+
+    @bot.message_handler(commands=['registered_users'])
+    def registered_users_list(message):
+        if message.from_user.id not in app.admin_ids:
+            bot.reply_to(message, "У вас нет прав для просмотра этой информации.")
+            return
+        contest = require_contest(app, message)
+        if contest is None:
+            return
+        bot.reply_to(message, "Введите код администратора:")
+        expect_step(app, message, "admin_password", contest)
+
+    def process_admin_password(message, contest):
+        password = message.text or ""
+        if hmac.compare_digest(password.encode('utf-8'), config.admin_password.encode('utf-8')):
+            bot.reply_to(message, f"Список зарегистрированных пользователей:\n{format_registered_users(app, contest)}")
+        else:
+            bot.reply_to(message, "Код администратора неверный.")
+
+    register_step(app, "admin_password", process_admin_password)
+
+
+# --- Объединение ответов шардов (см. OlympiadBot.fan_out) ---
+def merged(app, contest, operation, *args):
+    return [item for shard_result in app.fan_out(contest.contest_id, operation, *args) for item in shard_result]
+
+
+def participant_rows(app, contest):
+    # Username, сохраненный шардом участника, или (для старых записей) запрос к Telegram
+    return [(user_id, code, username if username is not None else app.get_username(user_id), registered)
+            for user_id, code, username, registered in merged(app, contest, "participant_rows")]
+
+
+def format_registered_users(app, contest):
+    user_list = ""
+    for user_id, code, username, registered in participant_rows(app, contest):
+        user_list += f"ID: {user_id}, Код: {code}, Username: @{username or 'Не указан'}\n"
+    return user_list
+
+
+# --- Проверка решений и баллы (организатор или админ, см. OlympiadBot.is_organizer) ---
+def register_jury_handlers(app):
+    bot = app.bot
+
+    @bot.message_handler(commands=['results'])
+    def results(message):
+        if not app.is_organizer(message):
+            bot.reply_to(message, NO_RIGHTS_TEXT)
+            return
+        contest = require_contest(app, message)
+        if contest is None:
+            return
+        users_with_solutions = dict(merged(app, contest, "users_with_solutions"))
+
+        if not users_with_solutions:
+            bot.reply_to(message, "Никто еще не отправил решения.")
+            return
+
+        codes_list = "\n".join(f"Код: {code}" for code in users_with_solutions.values())
+        bot.reply_to(message, f"Список кодов участников, отправивших решения:\n{codes_list}\n\n"
+                              "Чтобы посмотреть решение участника, отправьте его индивидуальный код:")
+        expect_step(app, message, "solution_code", contest)
+
+    def process_solution_code(message, contest):
+        code = parse_code(message.text)
+        owners = [owner for owner in app.fan_out(contest.contest_id, "solution_owner", code)
+                  if owner is not None] if code is not None else []
+        if not owners:
+            bot.reply_to(message, "Неверный код или участник не отправлял решение.")
+            return
+        user_id, username = owners[0]
+
+        try:
+            solution_file = contest.solution_path(username if username is not None else app.get_username(user_id))
+            if os.path.exists(solution_file):
+                with open(solution_file, 'rb') as file:
+                    bot.send_document(message.chat.id, file, caption=f"Решение пользователя с кодом: {code}")
+            else:
+                bot.reply_to(message, "Решение для этого пользователя не найдено.")
+        except telebot.apihelper.ApiException as e:
+            print(f"Ошибка при отправке решения пользователю {user_id}: {e}")
+        except Exception as e:
+            logging.error(f"Error processing solution code: {e}")
+            bot.reply_to(message, f"Произошла ошибка при обработке запроса: {e}")
+
+    register_step(app, "solution_code", process_solution_code)
+
+    @bot.message_handler(commands=['result_olymp'])
+    def result_olymp(message):
+        if not app.is_organizer(message):
+            bot.reply_to(message, NO_RIGHTS_TEXT)
+            return
+        contest = require_contest(app, message)
+        if contest is None:
+            return
+        users_list = "\n".join(
+            f"Код: {code}, Username: @{username}" for user_id, code, username, registered in
+            participant_rows(app, contest) if registered)
+        bot.reply_to(message, f"Список участников:\n{users_list}\n\n"
+                              "Чтобы добавить баллы участника, отправьте данные следующим образом:\n"
+                              "@username - [20] балл")
+        expect_step(app, message, "add_points", contest)
+
+    def process_add_points(message, contest):
+        try:
+            username, points = parse_points(message.text)
+
+            if not any(app.fan_out(contest.contest_id, "set_points", username, points)):
+                bot.reply_to(message, "Пользователь с таким username не найден.")
+                return
+
+            bot.reply_to(message, f"Баллы для пользователя @{username} успешно добавлены: {points}")
+
+        except Exception as e:
+            bot.reply_to(message, "Ошибка формата. Пример: @username - [20] балл")
+            logging.error(f"Error processing add points: {e}")
+
+    register_step(app, "add_points", process_add_points)
+
+    @bot.message_handler(commands=['list_balls'])
+    def list_balls(message):
+        if not app.is_organizer(message):
+            bot.reply_to(message, NO_RIGHTS_TEXT)
+            return
+        contest = require_contest(app, message)
+        if contest is None:
+            return
+        users_with_points = "\n".join(
+            f"@{username if username is not None else app.get_username(user_id)} - {points} балл(ов)"
+            for user_id, username, points in merged(app, contest, "users_with_points")
+        )
+        if users_with_points:
+            bot.reply_to(message, f"Список участников с баллами:\n{users_with_points}")
+        else:
+            bot.reply_to(message, "Пока нет участников с баллами.")
+
+
+# --- Обработчик добавления админа ---
+def register_admin_handlers(app):
+    bot = app.bot
+
+    @bot.message_handler(commands=['add_admin'])
+    def add_admin(message):
+        if message.from_user.id not in app.admin_ids:
+            bot.reply_to(message, NO_RIGHTS_TEXT)
+            return
+        bot.reply_to(message, "Введите ID пользователя, которого хотите сделать админом:")
+        expect_step(app, message, "new_admin_id")
+
+    def process_new_admin_id(message):
+        try:
+            new_admin_id = int(message.text)
+            app.fan_out(None, "add_admin_id", new_admin_id)  # Новый админ может попасть на любой шард
+            app.save_admin_ids()
+            bot.reply_to(message, f"Пользователь с ID {new_admin_id} теперь админ.")
+        except (TypeError, ValueError):
+            bot.reply_to(message, "Некорректный ID пользователя. Введите число.")
+
+    register_step(app, "new_admin_id", process_new_admin_id)
+
+
+# --- Обработчик всех текстовых сообщений (для блокировки команд во время таймера) ---
+# Регистрируется последним: telebot проверяет обработчики в порядке регистрации.
+def register_fallback_handler(app):
+    bot = app.bot
+
+    @bot.message_handler(func=lambda message: True, content_types=['text'])
+    def echo_all(message):
+        if app.check_timer(message):
+            bot.reply_to(message, TIMER_ACTIVE_TEXT)
+
+
+HANDLER_SETS = {
+    "participant": register_participant_handlers,
+    "organizer": register_organizer_handlers,
+    "admin_password": register_admin_password_handlers,
+    "jury": register_jury_handlers,
+    "admins": register_admin_handlers,
+    "fallback": register_fallback_handler,
+}
+
+# Наборы обработчиков для config.admin_mode:
+#   "organizer" - права организатора по username (ol.py, code.py, code12.py, codeq.py)
+#   "password"  - права по admin_ids, список участников дополнительно закрыт паролем (code1.py)
+MODE_HANDLER_SETS = {
+    "organizer": ("participant", "organizer", "jury", "admins", "fallback"),
+    "password": ("participant", "admin_password", "jury", "admins", "fallback"),
+}
+
+
+def handler_sets_for_mode(admin_mode):
+    return MODE_HANDLER_SETS[admin_mode]
+
+
+def register_handler_sets(app, names):
+    register_step_dispatcher(app)
+    for name in names:
+        try:
+            register = HANDLER_SETS[name]
+        except KeyError:
+            raise ValueError(f"Неизвестный набор обработчиков: {name}")
+        register(app)
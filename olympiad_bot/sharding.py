@@ -0,0 +1,230 @@
+import dataclasses
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError
+
+import telebot
+
+from config import shard_path
+from code_allocator import CodeAllocator
+from storage import create_user_store
+from webhook_server import WebhookServer, update_sender_id
+from olympiad_bot.app import create_bot
+
+
+# --- Шардирование участников по процессам ---
+# Процесс-распределитель получает обновления (webhook или long polling) и отправляет каждое в очередь
+# шарда user_id % shards. Шард - обычный OlympiadBot со своими файлами данных (*.shardN.*), таймерами
+# и очередью приема решений. Команды организатора выполняются на его шарде и через fan_out опрашивают
+# остальные шарды. Сообщения между процессами:
+#   ("update", json)                                        - обновление Telegram
+#   ("query", request_id, sender, contest_id, operation, args) - запрос другого шарда
+#   (request_id, result, error)                             - ответ на запрос (в очередь ответов отправителя)
+def shard_for(user_id, shards):
+    return user_id % shards
+
+
+# Настройки процесса-шарда: те же олимпиады, но свои файлы данных, очереди и контрольные точки
+def shard_config(config, shard_index):
+    contests = tuple(dataclasses.replace(contest,
+                                         user_data_file=shard_path(contest.user_data_file, shard_index),
+                                         user_snapshot_file=shard_path(contest.user_snapshot_file, shard_index),
+                                         user_journal_file=shard_path(contest.user_journal_file, shard_index),
+                                         user_db_file=shard_path(contest.user_db_file, shard_index))
+                     for contest in config.contest_configs())
+    return dataclasses.replace(config, shard_index=shard_index, contests=contests,
+                               file_id_cache_file=shard_path(config.file_id_cache_file, shard_index),
+                               broadcast_checkpoint_file=shard_path(config.broadcast_checkpoint_file, shard_index),
+                               ingestion_queue_file=shard_path(config.ingestion_queue_file, shard_index)).validate()
+
+
+# --- Разовое распределение участников при переходе на шарды ---
+# Если файлов шардов олимпиады еще нет, участники из общего файла раскладываются по шардам.
+def split_user_data(config):
+    shard_configs = [shard_config(config, index) for index in range(config.shards)]
+    for position, contest in enumerate(config.contest_configs()):
+        shard_contests = [shard.contest_configs()[position] for shard in shard_configs]
+        shard_files = [path for shard_contest in shard_contests
+                       for path in (shard_contest.user_data_file, shard_contest.user_snapshot_file,
+                                    shard_contest.user_journal_file, shard_contest.user_db_file)]
+        if any(os.path.exists(path) for path in shard_files):
+            continue
+        base_store = create_user_store(config.storage_backend, contest.user_snapshot_file, contest.user_journal_file,
+                                       contest.user_db_file, legacy_path=contest.user_data_file)
+        users = base_store.load()
+        base_store.close()
+        if not users:
+            continue
+        stores = [create_user_store(config.storage_backend, shard_contest.user_snapshot_file,
+                                    shard_contest.user_journal_file, shard_contest.user_db_file)
+                  for shard_contest in shard_contests]
+        for store in stores:
+            store.load()
+        # Одна пачка на шард: apply_changes пишет ее одной записью, а не строкой на каждого участника
+        batches = [[] for _ in stores]
+        for user_id, data in users.items():
+            batches[shard_for(user_id, config.shards)].append((user_id, data))
+        for store, batch in zip(stores, batches):
+            store.apply_changes(batch)
+            store.close()
+        print(f"Участники олимпиады {contest.contest_id} ({len(users)}) распределены по {config.shards} шардам.")
+
+
+# --- Связь шарда с остальными: ответы на их запросы и fan_out к ним ---
+class ShardLink:
+    def __init__(self, app, shard_index, inboxes, replies, timeout):
+        self.app = app
+        self.shard_index = shard_index
+        self.inboxes = inboxes
+        self.replies = replies
+        self.timeout = timeout
+        self._pending = {}  # {request_id: Future}
+        self._lock = threading.Lock()
+
+    def fan_out(self, contest_id, operation, args):
+        futures = []
+        for index, inbox in enumerate(self.inboxes):
+            if index == self.shard_index:
+                continue
+            request_id = uuid.uuid4().hex
+            future = Future()
+            with self._lock:
+                self._pending[request_id] = future
+            inbox.put(("query", request_id, self.shard_index, contest_id, operation, args))
+            futures.append((index, request_id, future))
+
+        results = [self.app.run_operation(contest_id, operation, args)]
+        for index, request_id, future in futures:
+            try:
+                results.append(future.result(timeout=self.timeout))
+            except TimeoutError:
+                raise RuntimeError(f"Шард {index} не ответил на запрос {operation}")
+            finally:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+        return results
+
+    def _read_replies(self):
+        reply_queue = self.replies[self.shard_index]
+        while True:
+            request_id, result, error = reply_queue.get()
+            with self._lock:
+                future = self._pending.get(request_id)
+            if future is None:
+                continue  # Ответ пришел после таймаута
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(result)
+
+    # Основной цикл шарда. Обработчики выполняет пул потоков telebot, поэтому цикл свободен
+    # для запросов других шардов, пока обработчик этого шарда ждет их ответов.
+    def serve(self):
+        threading.Thread(target=self._read_replies, daemon=True).start()
+        inbox = self.inboxes[self.shard_index]
+        while True:
+            message = inbox.get()
+            if message is None:
+                return
+            if message[0] == "update":
+                try:
+                    self.app.process_webhook_update(message[1])
+                except Exception as e:
+                    print(f"Ошибка при обработке обновления: {e}")
+            elif message[0] == "query":
+                _, request_id, sender, contest_id, operation, args = message
+                try:
+                    self.replies[sender].put((request_id, self.app.run_operation(contest_id, operation, args), None))
+                except Exception as e:
+                    self.replies[sender].put((request_id, None, f"{type(e).__name__}: {e}"))
+
+
+def _run_shard(config, shard_index, inboxes, replies):
+    config = shard_config(config, shard_index)
+    logging.basicConfig(filename=config.log_file, level=logging.INFO,
+                        format=f'%(asctime)s - shard{shard_index} - %(levelname)s - %(message)s')
+    app = create_bot(config)
+    app.shard = ShardLink(app, shard_index, inboxes, replies, config.shard_timeout_seconds)
+    app.start()
+    try:
+        app.shard.serve()
+    finally:
+        app.stop()
+
+
+# --- Процесс-распределитель ---
+class ShardedBot:
+    def __init__(self, config):
+        self.config = config
+        self._inboxes = []
+        self._processes = []
+
+    def prepare(self):
+        # Один ключ перестановки кодов на олимпиаду для всех шардов
+        code_allocator = CodeAllocator(self.config.code_allocator_file)
+        code_allocator.load()
+        code_allocator.ensure_namespaces([contest.contest_id for contest in self.config.contest_configs()])
+        split_user_data(self.config)
+
+    def start_workers(self):
+        context = multiprocessing.get_context("spawn")
+        self._inboxes = [context.Queue() for _ in range(self.config.shards)]
+        replies = [context.Queue() for _ in range(self.config.shards)]
+        for shard_index in range(self.config.shards):
+            process = context.Process(target=_run_shard, args=(self.config, shard_index, self._inboxes, replies),
+                                      name=f"olympiad-shard{shard_index}", daemon=True)
+            process.start()
+            self._processes.append(process)
+
+    def route(self, json_string):
+        update = json.loads(json_string)
+        self._inboxes[shard_for(update_sender_id(update), self.config.shards)].put(("update", json_string))
+
+    def run_webhook(self):
+        config = self.config
+        bot = telebot.TeleBot(config.bot_token)
+        server = WebhookServer(self.route, host=config.webhook_host, port=config.webhook_port,
+                               path=config.webhook_path, secret_token=config.webhook_secret_token,
+                               workers=config.webhook_workers)
+        bot.remove_webhook()
+        bot.set_webhook(url=config.webhook_url, secret_token=config.webhook_secret_token)
+        server.serve_forever()
+
+    # Long polling в распределителе: обновления не разбираются, а сразу передаются шардам
+    def run_polling(self):
+        telebot.TeleBot(self.config.bot_token).remove_webhook()
+        offset = None
+        while True:
+            try:
+                updates = telebot.apihelper.get_updates(self.config.bot_token, offset=offset, timeout=20)
+            except Exception as e:
+                print(f"Ошибка при получении обновлений: {e}")
+                time.sleep(3)
+                continue
+            for update in updates:
+                self.route(json.dumps(update))
+                offset = update["update_id"] + 1
+
+    def run(self):
+        self.prepare()
+        self.start_workers()
+        # Шарды - daemon-процессы: без stop() они завершатся вместе с распределителем, не сохранив
+        # изменения последнего окна отложенной записи
+        try:
+            if self.config.run_mode == "webhook":
+                self.run_webhook()
+            else:
+                self.run_polling()
+        finally:
+            self.stop()
+
+    def stop(self):
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
@@ -0,0 +1,140 @@
+import contextlib
+import threading
+
+DEFAULT_LOCK_STRIPES = 64
+MAX_POINTS = 2 ** 63 - 1  # Баллы хранятся в снимке как int64 (см. snapshot.py)
+
+# --- Флаги участника (поле Participant.flags) ---
+REGISTERED = 1
+SOLUTION_SENT = 2
+TIMER_ACTIVE = 4
+USERNAME_CHECKED = 8
+
+
+def _flag(bit):
+    def get(self):
+        return bool(self.flags & bit)
+
+    def set(self, value):
+        if value:
+            self.flags |= bit
+        else:
+            self.flags &= ~bit
+
+    return property(get, set)
+
+
+# --- Запись участника ---
+# __slots__ вместо словаря на каждого участника: код хранится числом, логические поля - битами flags.
+# Для архивов с сотнями тысяч участников это в несколько раз меньше памяти, чем dict с 8 ключами.
+class Participant:
+    __slots__ = ("code", "flags", "solution_time", "points", "username")
+
+    def __init__(self, code=None, flags=0, solution_time=None, points=0, username=None):
+        self.code = code  # int или None, пока участник не зарегистрирован
+        self.flags = flags
+        self.solution_time = solution_time  # datetime начала решения
+        self.points = points
+        self.username = username
+
+    registered = _flag(REGISTERED)
+    solution_sent = _flag(SOLUTION_SENT)
+    timer_active = _flag(TIMER_ACTIVE)
+    username_checked = _flag(USERNAME_CHECKED)
+
+    def copy(self):
+        return Participant(self.code, self.flags, self.solution_time, self.points, self.username)
+
+    def __eq__(self, other):
+        if not isinstance(other, Participant):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (f"Participant(code={self.code!r}, flags={self.flags}, solution_time={self.solution_time!r}, "
+                f"points={self.points}, username={self.username!r})")
+
+
+# Код, введенный участником, - число или None, если введено не число.
+# isdigit() верно и для "²", который int() не принимает, поэтому допускаются только цифры ASCII.
+def parse_code(text):
+    text = (text or "").strip()
+    return int(text) if text.isascii() and text.isdigit() else None
+
+
+# Строка жюри "@username - [20] балл" -> (username, points); ValueError/IndexError при неверном формате
+def parse_points(text):
+    username = text.split(" - ")[0].replace("@", "")
+    points = int(text.split("[")[1].split("]")[0])
+    if abs(points) > MAX_POINTS:
+        raise ValueError(f"слишком большое число баллов: {points}")
+    return username, points
+
+
+# --- Участники олимпиады: словарь с блокировками по участникам (lock striping) ---
+# Участника меняют поток бота, планировщик таймеров, очередь приема решений и запросы других шардов.
+# Каждый участник защищен одной из stripes блокировок (по user_id), поэтому изменения разных участников
+# не ждут друг друга. Проверка и изменение одного участника выполняются под его блокировкой:
+#     with table.lock(user_id):
+#         participant = table.get(user_id)
+#         ...
+# snapshot() на мгновение берет все блокировки и возвращает согласованную копию для сохранения и отчетов.
+# Внутри lock(user_id) snapshot() вызывать нельзя - так два потока могут ждать друг друга.
+class ParticipantTable:
+    def __init__(self, stripes=DEFAULT_LOCK_STRIPES):
+        self._users = {}  # {user_id: Participant}
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def lock(self, user_id):
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    @contextlib.contextmanager
+    def _all_locks(self):
+        with contextlib.ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            yield
+
+    def get(self, user_id, default=None):
+        return self._users.get(user_id, default)
+
+    def __getitem__(self, user_id):
+        return self._users[user_id]
+
+    def __contains__(self, user_id):
+        return user_id in self._users
+
+    def __len__(self):
+        return len(self._users)
+
+    def __setitem__(self, user_id, data):
+        with self.lock(user_id):
+            self._users[user_id] = data
+
+    def pop(self, user_id, default=None):
+        with self.lock(user_id):
+            return self._users.pop(user_id, default)
+
+    # Полная замена содержимого (загрузка из хранилища)
+    def replace(self, users):
+        with self._all_locks():
+            self._users = dict(users)
+
+    # Согласованный список [(user_id, копия Participant)] на один момент времени
+    def snapshot(self):
+        with self._all_locks():
+            return [(user_id, data.copy()) for user_id, data in self._users.items()]
+
+    def user_ids(self):
+        with self._all_locks():
+            return list(self._users)
+
+    # Обход по снимку ключей: участники, удаленные во время обхода, пропускаются
+    def items(self):
+        for user_id in self.user_ids():
+            data = self._users.get(user_id)
+            if data is not None:
+                yield user_id, data
+
+    def __iter__(self):
+        return iter(self.user_ids())
@@ -0,0 +1,85 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import bcrypt
+
+
+# --- Проверка пароля регистрации вне потока обработчиков ---
+# bcrypt.checkpw выполняется в пуле потоков (bcrypt освобождает GIL). Верно введенные пароли
+# запоминаются на cache_ttl_seconds по HMAC со случайным ключом процесса - сам пароль не хранится,
+# а повторный правильный ввод не платит стоимость bcrypt. После max_failures неудачных попыток
+# за window_seconds пользователь ждет, поэтому перебор не может занять весь CPU.
+# Несколько проверяющих (по одному на олимпиаду) могут делить один пул через executor.
+class PasswordVerifier:
+    def __init__(self, password_hash, workers=4, max_failures=5, window_seconds=60, cache_ttl_seconds=600,
+                 executor=None):
+        # Без хеша (не настроен) любой пароль считается неверным; запуск бота это проверяет отдельно
+        self.password_hash = password_hash.encode('utf-8') if password_hash else None
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._owns_pool = executor is None
+        self._pool = executor if executor is not None else ThreadPoolExecutor(max_workers=workers,
+                                                                              thread_name_prefix="bcrypt")
+        self._cache_key = secrets.token_bytes(32)
+        self._verified = {}  # {hmac(password): истекает}
+        self._failures = {}  # {user_id: [время неудачной попытки, ...]}
+        self._lock = threading.Lock()
+
+    def _digest(self, password):
+        return hmac.new(self._cache_key, password.encode('utf-8'), hashlib.sha256).digest()
+
+    def _recent_failures(self, user_id, now):
+        failures = [t for t in self._failures.get(user_id, []) if now - t < self.window_seconds]
+        if failures:
+            self._failures[user_id] = failures
+        else:
+            self._failures.pop(user_id, None)
+        return failures
+
+    # Сколько секунд пользователь должен подождать перед следующей попыткой (0 - можно сейчас)
+    def retry_after(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent_failures(user_id, now)
+            if len(failures) < self.max_failures:
+                return 0
+            return int(failures[0] + self.window_seconds - now) + 1
+
+    # Возвращает Future: True - пароль верный, False - неверный, None - слишком много попыток
+    def submit(self, user_id, password):
+        now = time.monotonic()
+        digest = self._digest(password)
+        with self._lock:
+            expires = self._verified.get(digest)
+            if expires is not None and expires > now:
+                return self._resolved(True)
+            if len(self._recent_failures(user_id, now)) >= self.max_failures:
+                return self._resolved(None)
+        return self._pool.submit(self._check, user_id, password, digest)
+
+    @staticmethod
+    def _resolved(value):
+        future = Future()
+        future.set_result(value)
+        return future
+
+    def _check(self, user_id, password, digest):
+        password_ok = self.password_hash is not None and bcrypt.checkpw(password.encode('utf-8'), self.password_hash)
+        now = time.monotonic()
+        with self._lock:
+            if password_ok:
+                self._verified = {d: e for d, e in self._verified.items() if e > now}
+                self._verified[digest] = now + self.cache_ttl_seconds
+                self._failures.pop(user_id, None)
+            else:
+                self._failures.setdefault(user_id, []).append(now)
+        return password_ok
+
+    def shutdown(self):
+        if self._owns_pool:
+            self._pool.shutdown(wait=True)
@@ -0,0 +1,121 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from broadcast import TELEGRAM_GLOBAL_RATE, TokenBucket, retry_after_seconds
+
+DEFAULT_REMINDER_MINUTES = (30, 10, 5, 1)
+
+
+def format_remaining(remaining_time):
+    hours, remainder = divmod(max(remaining_time.total_seconds(), 0), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+
+
+# --- Политика напоминаний: сообщения только на отметках "осталось N минут" ---
+# Вместо тиков каждые 10 минут / минуту / секунду участник получает по одному сообщению на каждую отметку.
+class ReminderPolicy:
+    def __init__(self, minutes=DEFAULT_REMINDER_MINUTES):
+        self.milestones = sorted({datetime.timedelta(minutes=m) for m in minutes}, reverse=True)
+
+    # Момент следующего напоминания после now; если отметок не осталось - end_time (истечение таймера)
+    def next_time(self, now, end_time):
+        for milestone in self.milestones:
+            when = end_time - milestone
+            if when > now:
+                return when
+        return end_time
+
+
+# --- Пакетная отправка напоминаний ---
+# Напоминания, сработавшие в один тик планировщика, собираются в пачку и отправляются пулом потоков
+# через общий с рассылками token bucket, поэтому вместе они не превышают лимит Telegram. Новое
+# напоминание участнику заменяет еще не отправленное старое. В режиме edit_in_place у участника одно
+# сообщение-таймер, которое обновляется через edit_message_text.
+class ReminderSender:
+    def __init__(self, send, edit=None, bucket=None, workers=4, edit_in_place=False):
+        self.send = send  # send(chat_id, text) -> Message
+        self.edit = edit  # edit(text, chat_id, message_id)
+        self.bucket = bucket if bucket is not None else TokenBucket(TELEGRAM_GLOBAL_RATE)
+        self.workers = workers
+        self.edit_in_place = edit_in_place and edit is not None
+        self._pending = {}  # {chat_id: text}
+        self._message_ids = {}  # {chat_id: message_id} - сообщение-таймер для режима edit_in_place
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+        self._thread.start()
+
+    # Останавливает поток; уже поставленные сообщения (например, об истечении таймера) отправляются до выхода
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        else:
+            with self._condition:
+                batch, self._pending = self._pending, {}
+            for item in batch.items():
+                self._deliver(item)
+
+    def submit(self, chat_id, text):
+        with self._condition:
+            self._pending[chat_id] = text
+            self._condition.notify()
+
+    # Таймер участника закончился - неотправленное напоминание больше не нужно
+    def forget(self, chat_id):
+        with self._condition:
+            self._pending.pop(chat_id, None)
+            self._message_ids.pop(chat_id, None)
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reminder") as pool:
+            while True:
+                with self._condition:
+                    while self._running and not self._pending:
+                        self._condition.wait()
+                    running = self._running
+                    batch, self._pending = self._pending, {}
+                # После stop() отправляется последняя пачка; повторы после 429 уже не ждем
+                list(pool.map(self._deliver, batch.items()))
+                if not running:
+                    return
+
+    def _deliver(self, item):
+        chat_id, text = item
+        message_id = self._message_ids.get(chat_id) if self.edit_in_place else None
+        self.bucket.acquire()
+        try:
+            if message_id is not None:
+                self.edit(text, chat_id, message_id)
+                return
+            message = self.send(chat_id, text)
+            if self.edit_in_place and message is not None:
+                with self._condition:
+                    self._message_ids[chat_id] = message.message_id
+        except Exception as e:
+            retry_after = retry_after_seconds(e)
+            if retry_after is not None:
+                self.bucket.pause(retry_after)
+                with self._condition:
+                    self._pending.setdefault(chat_id, text)  # Повторим, если не пришло более новое
+                    self._condition.notify()
+            elif message_id is not None:
+                # Сообщение-таймер удалено - отправляем напоминание новым сообщением
+                with self._condition:
+                    self._message_ids.pop(chat_id, None)
+                    self._pending.setdefault(chat_id, text)
+                    self._condition.notify()
+            else:
+                print(f"Ошибка при отправке таймера пользователю {chat_id}: {e}")
@@ -0,0 +1,91 @@
+import datetime
+import os
+import struct
+import zlib
+
+from participants import Participant
+
+# --- Двоичный снимок участников ---
+# Заголовок: magic, версия схемы, число записей, CRC32 тела.
+# Тело: записи фиксированной длины (user_id, code, flags, solution_time, points, есть ли username),
+# за ними - все username в UTF-8 через "\n" (в username Telegram перевода строки быть не может).
+# solution_time - микросекунды от 1970-01-01 по локальному времени, как в datetime без часового пояса.
+# Отсутствующие значения: code = NO_CODE, solution_time = NO_TIME.
+# Записи фиксированной длины читаются struct.iter_unpack, а username - одним decode, без разбора по строкам.
+# Версия 1 хранила points в int32 и по-прежнему читается; записывается всегда SNAPSHOT_VERSION.
+SNAPSHOT_MAGIC = b"OLYS"
+SNAPSHOT_VERSION = 2
+_HEADER = struct.Struct("<4sHII")
+_RECORDS = {1: struct.Struct("<qiBqiB"), 2: struct.Struct("<qiBqqB")}
+_RECORD = _RECORDS[SNAPSHOT_VERSION]
+NO_CODE = -1
+NO_TIME = -(2 ** 63)
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+# users - список [(user_id, Participant)]
+def pack_snapshot(users):
+    records = bytearray()
+    usernames = []
+    for user_id, data in users:
+        solution_time = NO_TIME if data.solution_time is None else (data.solution_time - _EPOCH) // _MICROSECOND
+        try:
+            records += _RECORD.pack(user_id, NO_CODE if data.code is None else data.code, data.flags, solution_time,
+                                    data.points, data.username is not None)
+        except struct.error as e:
+            raise SnapshotFormatError(f"участник {user_id} не помещается в снимок ({e}): {data!r}")
+        if data.username is not None:
+            usernames.append(data.username)
+    body = bytes(records) + "\n".join(usernames).encode("utf-8")
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(users), zlib.crc32(body)) + body
+
+
+def unpack_snapshot(buffer, path="<snapshot>"):
+    if len(buffer) < _HEADER.size:
+        raise SnapshotFormatError(f"{path}: файл снимка обрезан")
+    magic, version, count, checksum = _HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotFormatError(f"{path}: это не снимок участников")
+    record = _RECORDS.get(version)
+    if record is None:
+        raise SnapshotFormatError(f"{path}: неизвестная версия снимка {version}")
+    body = memoryview(buffer)[_HEADER.size:]
+    if zlib.crc32(body) != checksum:
+        raise SnapshotFormatError(f"{path}: контрольная сумма не совпадает")
+    records_size = count * record.size
+    if len(body) < records_size:
+        raise SnapshotFormatError(f"{path}: файл снимка обрезан")
+
+    usernames = iter(str(body[records_size:], "utf-8").split("\n"))
+    users = {}
+    try:
+        for user_id, code, flags, solution_time, points, has_username in record.iter_unpack(body[:records_size]):
+            users[user_id] = Participant(None if code == NO_CODE else code, flags,
+                                         None if solution_time == NO_TIME else _EPOCH + _MICROSECOND * solution_time,
+                                         points, next(usernames) if has_username else None)
+    except StopIteration:
+        raise SnapshotFormatError(f"{path}: username меньше, чем записей")
+    # [""] остается, когда username не было совсем: "".split("\n") == [""]
+    if list(usernames) not in ([], [""]):
+        raise SnapshotFormatError(f"{path}: лишние данные после {count} записей")
+    return users
+
+
+def read_snapshot(path):
+    with open(path, "rb") as f:
+        return unpack_snapshot(f.read(), path)
+
+
+# Атомарная запись: временный файл, fsync, переименование
+def write_snapshot(path, users):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pack_snapshot(users))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
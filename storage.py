@@ -0,0 +1,384 @@
+import abc
+import datetime
+import os
+import sqlite3
+import threading
+
+from participants import REGISTERED, SOLUTION_SENT, TIMER_ACTIVE, USERNAME_CHECKED, Participant
+from snapshot import SnapshotFormatError, read_snapshot, write_snapshot
+
+
+# --- Формат строки участника: user_id,code,registered,solution_sent,solution_time,timer_active,username_checked,points,username ---
+def format_user_record(user_id, data):
+    return (f"{user_id},{data.code},{data.registered},{data.solution_sent},{data.solution_time},"
+            f"{data.timer_active},{data.username_checked},{data.points},{data.username}")
+
+
+def _flags(registered, solution_sent, timer_active, username_checked):
+    return ((REGISTERED if registered else 0) | (SOLUTION_SENT if solution_sent else 0) |
+            (TIMER_ACTIVE if timer_active else 0) | (USERNAME_CHECKED if username_checked else 0))
+
+
+def _parse_bool(value):
+    if value == "True":
+        return True
+    if value == "False":
+        return False
+    raise ValueError(value)
+
+
+# Разбор строки старого текстового формата (6-9 полей). None - число полей не подходит ни к одной схеме,
+# ValueError - поле не соответствует схеме (например, запятая в username сдвинула значения).
+def parse_user_record(line):
+    values = line.strip().split(",")
+    if len(values) == 9:
+        user_id, code, registered, solution_sent, solution_time, timer_active, username_checked, points, username = values
+    elif len(values) == 8:
+        user_id, code, registered, solution_sent, solution_time, timer_active, username_checked, points = values
+        username = "None"  # Username в старых записях не сохранялся
+    elif len(values) == 7:  # Обработка старых записей
+        user_id, code, registered, solution_sent, solution_time, timer_active, username_checked = values
+        points = "0"  # Значение по умолчанию для старых записей
+        username = "None"
+    elif len(values) == 6:
+        user_id, code, registered, solution_sent, solution_time, timer_active = values
+        username_checked = "False"
+        points = "0"
+        username = "None"
+    else:
+        return None
+
+    return int(user_id), Participant(
+        code=int(code) if code != "None" else None,
+        flags=_flags(_parse_bool(registered), _parse_bool(solution_sent), _parse_bool(timer_active),
+                     _parse_bool(username_checked)),
+        solution_time=datetime.datetime.fromisoformat(solution_time) if solution_time != "None" else None,
+        points=int(points),
+        username=username if username != "None" else None)
+
+
+# --- Разовая миграция текстового снимка (user_data.txt) ---
+# Неоднозначные строки не пропускаются молча: миграция останавливается со списком таких строк,
+# чтобы их можно было исправить вручную.
+def read_legacy_snapshot(path):
+    users = {}
+    rejected = []
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                parsed = parse_user_record(line)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                rejected.append(f"{line_number}: {line.strip()}")
+                continue
+            user_id, data = parsed
+            users[user_id] = data
+    if rejected:
+        raise SnapshotFormatError(f"{path}: строки не соответствуют ни одной схеме:\n" + "\n".join(rejected))
+    return users
+
+
+# --- Базовый интерфейс хранилища участников ---
+# load() возвращает словарь {user_id: Participant}, save_user()/delete_user() сохраняют изменения одного участника.
+# Запросы организатора (users_with_solutions, users_with_points) каждое хранилище выполняет по-своему;
+# поиск по коду и username бот делает по индексам в памяти (Contest.code_index, Contest.username_index), поэтому в интерфейсе его нет.
+# Методы абстрактные: хранилище, в котором чего-то не хватает, не создастся, а не упадет посреди олимпиады.
+class UserStore(abc.ABC):
+    @abc.abstractmethod
+    def load(self):
+        pass
+
+    @abc.abstractmethod
+    def save_user(self, user_id, data):
+        pass
+
+    # Сохранение многих участников сразу (например, при восстановлении таймеров после перезапуска)
+    def save_users(self, items):
+        self.apply_changes(items)
+
+    # Пачка изменений [(user_id, Participant или None - участник удален)] одной записью
+    def apply_changes(self, changes):
+        for user_id, data in changes:
+            if data is None:
+                self.delete_user(user_id)
+            else:
+                self.save_user(user_id, data)
+
+    @abc.abstractmethod
+    def delete_user(self, user_id):
+        pass
+
+    @abc.abstractmethod
+    def users_with_solutions(self):
+        pass
+
+    @abc.abstractmethod
+    def users_with_points(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# --- Хранилище: снимок (snapshot) + журнал изменений (write-ahead journal) ---
+# Снимок - двоичный файл с версией схемы (см. snapshot.py). Каждое изменение дописывает в журнал одну строку:
+#   U,<строка участника>  - добавление/обновление
+#   D,<user_id>           - удаление
+# При загрузке состояние восстанавливается из снимка и хвоста журнала,
+# периодическое сжатие (compaction) переписывает снимок и очищает журнал.
+# legacy_path - текстовый снимок старого формата: если двоичного снимка еще нет, участники читаются
+# из него один раз и сразу сохраняются в двоичный снимок.
+class JournalStore(UserStore):
+    def __init__(self, snapshot_path, journal_path, legacy_path=None, compact_every=1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self._users = {}  # {user_id: копия Participant на момент сохранения} - то, что попадет в следующий снимок
+        self._journal = None
+        self._journal_size = 0
+        # Сохраняют участников разные потоки; сжатие обходит _users, пока другие дописывают журнал
+        self._lock = threading.RLock()
+
+    def _load_snapshot(self):
+        if os.path.exists(self.snapshot_path):
+            return read_snapshot(self.snapshot_path)
+        if self.legacy_path is not None and os.path.exists(self.legacy_path):
+            users = read_legacy_snapshot(self.legacy_path)
+            print(f"Участники ({len(users)}) перенесены из {self.legacy_path} в {self.snapshot_path}.")
+            return users
+        print(f"Файл {self.snapshot_path} не найден. Создается новый.")
+        return {}
+
+    def load(self):
+        users = self._load_snapshot()
+        try:
+            with open(self.journal_path, "r") as f:
+                lines = [(line_number, line) for line_number, line in enumerate(f, 1) if line.strip()]
+        except FileNotFoundError:
+            lines = []
+
+        # Недописанной после аварийного завершения может быть только последняя строка - ее пропускаем.
+        # Поврежденную строку в середине не пропускаем: сжатие ниже очистило бы журнал, и запись пропала бы.
+        rejected = []
+        for index, (line_number, line) in enumerate(lines):
+            try:
+                self._replay(line, users)
+            except ValueError:
+                if index == len(lines) - 1 and not rejected:
+                    print(f"Пропущена недописанная последняя запись журнала {self.journal_path}: {line.strip()}")
+                else:
+                    rejected.append(f"{line_number}: {line.strip()}")
+        if rejected:
+            raise SnapshotFormatError(f"{self.journal_path}: поврежденные записи журнала:\n" + "\n".join(rejected))
+
+        # Начинаем с чистого журнала, чтобы хвост не рос между перезапусками
+        with self._lock:
+            self._users = {user_id: data.copy() for user_id, data in users.items()}
+            self._compact()
+        return users
+
+    # ValueError, если строку нельзя разобрать
+    def _replay(self, line, users):
+        op, _, payload = line.strip().partition(",")
+        if op == "U":
+            parsed = parse_user_record(payload)
+            if parsed is None:
+                raise ValueError(payload)
+            user_id, data = parsed
+            users[user_id] = data
+        elif op == "D":
+            users.pop(int(payload), None)
+        else:
+            raise ValueError(line)
+
+    def save_user(self, user_id, data):
+        record = format_user_record(user_id, data)
+        with self._lock:
+            self._users[user_id] = data.copy()
+            self._append(f"U,{record}\n")
+
+    # Все записи дописываются в журнал одной операцией с одним fsync
+    def apply_changes(self, changes):
+        lines = []
+        with self._lock:
+            for user_id, data in changes:
+                if data is None:
+                    self._users.pop(user_id, None)
+                    lines.append(f"D,{user_id}\n")
+                else:
+                    self._users[user_id] = data.copy()
+                    lines.append(f"U,{format_user_record(user_id, data)}\n")
+            if lines:
+                self._append("".join(lines), len(lines))
+
+    def delete_user(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._append(f"D,{user_id}\n")
+
+    # В текстовом хранилище нет индексов - запросы проходят по всем участникам
+    def users_with_solutions(self):
+        with self._lock:
+            return [(user_id, data.code) for user_id, data in self._users.items() if data.solution_sent]
+
+    def users_with_points(self):
+        with self._lock:
+            return [(user_id, data.points) for user_id, data in self._users.items() if data.points > 0]
+
+    def _append(self, line, count=1):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a")
+        self._journal.write(line)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal_size += count
+        if self._journal_size >= self.compact_every:
+            # Записи уже в журнале: ошибка сжатия не должна выглядеть как ошибка записи,
+            # иначе вызывающий допишет те же строки еще раз. Журнал сожмется при следующей попытке.
+            try:
+                self._compact()
+            except Exception as e:
+                print(f"Ошибка при сжатии журнала {self.journal_path}: {e}")
+
+    # --- Сжатие: атомарно записываем новый снимок и очищаем журнал ---
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        write_snapshot(self.snapshot_path, list(self._users.items()))
+
+        # Если упадем здесь, повторное применение журнала к новому снимку ничего не изменит
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, "w")
+        self._journal_size = 0
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+
+# --- Хранилище SQLite (WAL) с индексами по solution_sent и points ---
+class SQLiteStore(UserStore):
+    COLUMNS = ("user_id", "code", "registered", "solution_sent", "solution_time", "timer_active",
+               "username_checked", "points", "username")
+
+    def __init__(self, db_path, legacy_path=None):
+        self.db_path = db_path
+        self.legacy_path = legacy_path  # Текстовый файл старого формата для разового импорта
+        self._lock = threading.Lock()  # Соединение используется потоком бота и потоком таймеров
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS participants (
+                user_id INTEGER PRIMARY KEY,
+                code TEXT,
+                registered INTEGER NOT NULL,
+                solution_sent INTEGER NOT NULL,
+                solution_time TEXT,
+                timer_active INTEGER NOT NULL,
+                username_checked INTEGER NOT NULL,
+                points INTEGER NOT NULL DEFAULT 0,
+                username TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_participants_solution_sent ON participants(solution_sent);
+            CREATE INDEX IF NOT EXISTS idx_participants_points ON participants(points);
+        """)
+        self._conn.commit()
+
+    # Колонка code остается текстовой, чтобы старые базы читались без миграции
+    @staticmethod
+    def _to_row(user_id, data):
+        solution_time = data.solution_time.isoformat() if data.solution_time is not None else None
+        return (user_id, str(data.code) if data.code is not None else None, data.registered, data.solution_sent,
+                solution_time, data.timer_active, data.username_checked, data.points, data.username)
+
+    @staticmethod
+    def _from_row(row):
+        user_id, code, registered, solution_sent, solution_time, timer_active, username_checked, points, username = row
+        return user_id, Participant(
+            code=int(code) if code is not None else None,
+            flags=_flags(registered, solution_sent, timer_active, username_checked),
+            solution_time=datetime.datetime.fromisoformat(solution_time) if solution_time is not None else None,
+            points=points,
+            username=username)
+
+    def load(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM participants").fetchone()[0]
+        if count == 0 and self.legacy_path is not None:
+            self._import_legacy()
+
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM participants").fetchall()
+        return dict(self._from_row(row) for row in rows)
+
+    def _import_legacy(self):
+        try:
+            users = read_legacy_snapshot(self.legacy_path)
+        except FileNotFoundError:
+            return
+        rows = [self._to_row(user_id, data) for user_id, data in users.items()]
+        self._write_many(rows)
+        print(f"Импортировано {len(rows)} участников из {self.legacy_path}.")
+
+    def _write_many(self, rows):
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO participants ({', '.join(self.COLUMNS)}) VALUES ({placeholders})", rows)
+            self._conn.commit()
+
+    def save_user(self, user_id, data):
+        self._write_many([self._to_row(user_id, data)])
+
+    # Одна транзакция на пачку
+    def apply_changes(self, changes):
+        rows = [self._to_row(user_id, data) for user_id, data in changes if data is not None]
+        deleted = [(user_id,) for user_id, data in changes if data is None]
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        with self._lock:
+            if rows:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO participants ({', '.join(self.COLUMNS)}) VALUES ({placeholders})", rows)
+            if deleted:
+                self._conn.executemany("DELETE FROM participants WHERE user_id = ?", deleted)
+            self._conn.commit()
+
+    def delete_user(self, user_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM participants WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def users_with_solutions(self):
+        return [(user_id, int(code) if code is not None else None) for user_id, code in
+                self._query("SELECT user_id, code FROM participants WHERE solution_sent = 1")]
+
+    def users_with_points(self):
+        return self._query("SELECT user_id, points FROM participants WHERE points > 0")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Выбор хранилища по настройке ---
+# legacy_path - текстовый файл участников старого формата (user_data.txt) для разовой миграции
+def create_user_store(backend, snapshot_path, journal_path, db_path, legacy_path=None):
+    if backend == "journal":
+        return JournalStore(snapshot_path, journal_path, legacy_path=legacy_path)
+    if backend == "sqlite":
+        return SQLiteStore(db_path, legacy_path=legacy_path)
+    raise ValueError(f"Неизвестное хранилище данных: {backend}")
@@ -0,0 +1,157 @@
+import datetime
+import json
+import time
+
+import bcrypt
+import pytest
+import telebot
+
+from config import BotConfig
+from olympiad_bot import create_bot
+from olympiad_bot.contest import TIMER_EXPIRED_TEXT
+
+PASSWORD = "secret"
+
+
+# Поддельный бот: ответы копятся в списке, в сеть ничего не уходит
+class FakeBot(telebot.TeleBot):
+    def __init__(self):
+        super().__init__("1:fake", threaded=False)
+        self.replies = []
+
+    def reply_to(self, message, text, **kwargs):
+        self.replies.append((message.chat.id, text))
+        return message
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.replies.append((chat_id, text))
+
+    def send_document(self, chat_id, document, **kwargs):
+        self.replies.append((chat_id, "<document>"))
+        return telebot.types.Message.de_json(json.dumps({
+            "message_id": 1, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+            "document": {"file_id": "TASKS", "file_unique_id": "TASKS"}}))
+
+
+def make_update(user_id, username, text=None, document=None, date=None, counter=[0]):
+    counter[0] += 1
+    message = {"message_id": counter[0], "date": int(date if date is not None else time.time()),
+               "chat": {"id": user_id, "type": "private"},
+               "from": {"id": user_id, "is_bot": False, "first_name": username, "username": username}}
+    if text is not None:
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    if document is not None:
+        message["document"] = document
+    return telebot.types.Update.de_json(json.dumps({"update_id": counter[0], "message": message}))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(telebot.apihelper, "ENABLE_MIDDLEWARE", True)
+    (tmp_path / "tasks.pdf").write_bytes(b"%PDF-1.4")
+    config = BotConfig(bot_token="1:fake",
+                       register_password_hash=bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(4)).decode(),
+                       olympiad_start=datetime.datetime(2020, 1, 1), olympiad_end=datetime.datetime(2099, 1, 1),
+                       tasks_file_path="tasks.pdf").validate()
+    app = create_bot(config, bot=FakeBot())
+    app.load()
+    yield app
+    app.stop()
+
+
+def send(app, *args, **kwargs):
+    app.bot.process_new_updates([make_update(*args, **kwargs)])
+    return app.bot.replies[-1][1]
+
+
+def wait_for_reply(app, count, timeout=5):
+    deadline = time.time() + timeout
+    while len(app.bot.replies) < count and time.time() < deadline:
+        time.sleep(0.01)
+    return app.bot.replies[-1][1]
+
+
+def register(app, user_id, username):
+    assert send(app, user_id, username, "/register") == "Введите пароль, который дал организатор:"
+    count = len(app.bot.replies)
+    send(app, user_id, username, PASSWORD)
+    return wait_for_reply(app, count + 1)
+
+
+def test_register_get_tasks_and_send_solution(app):
+    contest = app.contests["default"]
+    assert register(app, 5, "alice").startswith("Вы успешно зарегистрировались")
+    data = contest.registered_users[5]
+    assert data.registered and data.username == "alice"
+
+    assert send(app, 5, "alice", "/get_tasks") == "Введите ваш индивидуальный код:"
+    assert send(app, 5, "alice", str(data.code)) == "Задания отправлены. У вас есть 1 час на решение."
+    assert (5, "<document>") in app.bot.replies
+    assert contest.timer_active(5)
+
+    reply = send(app, 5, "alice", document={"file_id": "F", "file_unique_id": "U", "file_name": "answer.pdf",
+                                            "file_size": 100})
+    assert reply.startswith("Получили вашу работу")
+    assert data.solution_sent and not data.timer_active
+    assert send(app, 9, "erkinzodsaidjon", "/results").startswith("Список кодов участников")
+
+
+def test_wrong_password_keeps_waiting_for_password(app):
+    assert send(app, 6, "bob", "/register") == "Введите пароль, который дал организатор:"
+    count = len(app.bot.replies)
+    send(app, 6, "bob", "wrong")
+    assert wait_for_reply(app, count + 2) == "Введите пароль, который дал организатор:"
+    assert not app.contests["default"].is_registered(6)
+    assert app.conversations.get(6) == ("register_password", "default")
+
+
+def test_solution_sent_before_deadline_is_accepted_after_expiry(app):
+    contest = app.contests["default"]
+    register(app, 7, "carol")
+    send(app, 7, "carol", "/get_tasks")
+    send(app, 7, "carol", str(contest.registered_users[7].code))
+    sent_at = time.time()
+    contest.expire_solution_timer(7)  # Планировщик закрыл таймер раньше, чем обработано сообщение
+    reply = send(app, 7, "carol", document={"file_id": "F", "file_unique_id": "U", "file_name": "answer.pdf",
+                                            "file_size": 100}, date=sent_at)
+    assert reply.startswith("Получили вашу работу")
+
+
+def test_participant_commands_are_blocked_during_timer(app):
+    contest = app.contests["default"]
+    register(app, 8, "dave")
+    send(app, 8, "dave", "/get_tasks")
+    send(app, 8, "dave", str(contest.registered_users[8].code))
+    assert send(app, 8, "dave", "/stat") == "Во время решения олимпиады вам доступна только команда /help."
+
+
+def test_timers_are_restored_after_restart(app):
+    contest = app.contests["default"]
+    for user_id, username in ((11, "erin"), (12, "frank")):
+        register(app, user_id, username)
+        send(app, user_id, username, "/get_tasks")
+        send(app, user_id, username, str(contest.registered_users[user_id].code))
+    # Срок таймера второго участника истек, пока бот был остановлен
+    with contest.registered_users.lock(12):
+        contest.registered_users[12].solution_time -= datetime.timedelta(hours=2)
+    contest.save_user_data(12)
+    app.stop()
+
+    restarted = create_bot(app.config, bot=FakeBot())
+    restarted.start()
+    try:
+        restored = restarted.contests["default"]
+        assert restarted.timer_scheduler.is_scheduled(restored.timer_key(11))
+        assert restored.registered_users[11].timer_active
+        assert not restarted.timer_scheduler.is_scheduled(restored.timer_key(12))
+        assert not restored.registered_users[12].timer_active
+        deadline = time.time() + 5
+        while (12, TIMER_EXPIRED_TEXT) not in restarted.bot.replies and time.time() < deadline:
+            time.sleep(0.01)
+        assert (12, TIMER_EXPIRED_TEXT) in restarted.bot.replies
+        assert (11, TIMER_EXPIRED_TEXT) not in restarted.bot.replies
+    finally:
+        restarted.stop()
@@ -0,0 +1,34 @@
+import datetime
+
+import pytest
+
+from config import ConfigError, load_config
+
+
+def write_config(tmp_path, text):
+    path = tmp_path / "olympiad.toml"
+    path.write_text('bot_token = "1:fake"\n' + text, encoding="utf-8")
+    return str(path)
+
+
+def test_toml_datetime(tmp_path):
+    config = load_config(write_config(tmp_path, "olympiad_start = 2025-03-04T10:00:00\n"), environ={})
+    assert config.olympiad_start == datetime.datetime(2025, 3, 4, 10, 0)
+
+
+@pytest.mark.parametrize("value", ["2025-03-04", "10:00:00", "[2025]", '"вчера"'])
+def test_invalid_datetime_is_config_error(tmp_path, value):
+    with pytest.raises(ConfigError, match="olympiad_start"):
+        load_config(write_config(tmp_path, f"olympiad_start = {value}\n"), environ={})
+
+
+def test_contest_tables(tmp_path):
+    config = load_config(write_config(tmp_path, '[[contests]]\ncontest_id = "math"\n\n'
+                                                '[[contests]]\ncontest_id = "phys"\n'), environ={})
+    assert [contest.contest_id for contest in config.contest_configs()] == ["math", "phys"]
+
+
+@pytest.mark.parametrize("value", ["5", '"math"', '{ contest_id = "math" }', "[5]"])
+def test_invalid_contests_is_config_error(tmp_path, value):
+    with pytest.raises(ConfigError, match="contest"):
+        load_config(write_config(tmp_path, f"contests = {value}\n"), environ={})
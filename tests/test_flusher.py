@@ -0,0 +1,73 @@
+import threading
+import time
+
+from flusher import DebouncedFlusher
+
+
+# write для DebouncedFlusher: запоминает пачки, первые failures вызовов падают
+class Writer:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+        self.written = threading.Event()
+
+    def __call__(self, keys):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("диск недоступен")
+        self.batches.append(set(keys))
+        self.written.set()
+
+
+def test_marks_within_window_give_one_write():
+    writer = Writer()
+    flusher = DebouncedFlusher(writer, window=0.2)
+    flusher.start()
+    try:
+        for key in ("a", "b", "a", "c"):
+            flusher.mark(key)
+        assert writer.written.wait(5)
+        time.sleep(0.3)  # Следующее окно: новых записей быть не должно
+        assert writer.batches == [{"a", "b", "c"}]
+        assert flusher.pending() == 0
+    finally:
+        flusher.stop()
+
+
+def test_failed_write_keeps_keys():
+    writer = Writer(failures=1)
+    flusher = DebouncedFlusher(writer)
+    flusher.mark("a")
+    flusher.mark("b")
+    assert not flusher.flush()
+    assert flusher.pending() == 2
+    flusher.mark("c")
+    assert flusher.flush()
+    assert writer.batches == [{"a", "b", "c"}]
+    assert flusher.pending() == 0
+
+
+def test_failed_write_is_retried_in_background():
+    writer = Writer(failures=1)
+    flusher = DebouncedFlusher(writer, window=0.05)
+    flusher.start()
+    try:
+        flusher.mark("a")
+        assert writer.written.wait(5)
+        assert writer.batches == [{"a"}]
+    finally:
+        flusher.stop()
+
+
+def test_stop_flushes_pending_keys():
+    writer = Writer()
+    flusher = DebouncedFlusher(writer, window=60)
+    flusher.start()
+    flusher.mark("a")
+    flusher.mark("b")
+    time.sleep(0.1)  # Фоновый поток уже ждет окончания окна
+    started = time.monotonic()
+    flusher.stop()
+    assert time.monotonic() - started < 5  # stop() не ждет окно целиком
+    assert writer.batches == [{"a", "b"}]
+    assert flusher.pending() == 0
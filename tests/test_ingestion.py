@@ -0,0 +1,112 @@
+import datetime
+import threading
+
+import pytest
+
+import ingestion
+from ingestion import IngestionQueue
+
+SUBMITTED_AT = datetime.datetime(2025, 3, 4, 10, 30)
+
+
+# process/on_failure для очереди: запоминает задания и сообщает, когда обработано нужное число
+class Recorder:
+    def __init__(self, expected, errors=()):
+        self.expected = expected
+        self.errors = list(errors)  # Исключения, которые бросят первые вызовы process
+        self.processed = []
+        self.failed = []
+        self.calls = 0
+        self.done = threading.Event()
+
+    def process(self, job):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.processed.append(job)
+        self._check()
+
+    def on_failure(self, job, error):
+        self.failed.append((job, error))
+        self._check()
+
+    def _check(self):
+        if len(self.processed) + len(self.failed) >= self.expected:
+            self.done.set()
+
+
+def drain(ingestion_queue, recorder):
+    ingestion_queue.start()
+    try:
+        assert recorder.done.wait(5)
+    finally:
+        ingestion_queue.stop()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "ingestion_queue.txt")
+
+
+def test_unfinished_jobs_are_requeued_on_load(journal):
+    with open(journal, "w") as f:
+        f.write(f"J,job1,5,F1,{SUBMITTED_AT.isoformat()},math,downloads/a.pdf\n")
+        f.write(f"A,job2,6,F2,{SUBMITTED_AT.isoformat()},downloads/b,c.pdf\n")
+        f.write(f"J,job3,7,F3,{SUBMITTED_AT.isoformat()},,downloads/c.pdf\n")
+        f.write("D,job3\n")
+    recorder = Recorder(expected=2)
+    ingestion_queue = IngestionQueue(journal, recorder.process, recorder.on_failure, workers=1)
+    ingestion_queue.load()
+    assert ingestion_queue.pending_count() == 2
+
+    drain(ingestion_queue, recorder)
+    jobs = {job["job_id"]: job for job in recorder.processed}
+    assert set(jobs) == {"job1", "job2"}
+    assert jobs["job1"] == {"job_id": "job1", "user_id": 5, "file_id": "F1", "dest_path": "downloads/a.pdf",
+                            "contest_id": "math", "submitted_at": SUBMITTED_AT}
+    assert jobs["job2"]["contest_id"] is None and jobs["job2"]["dest_path"] == "downloads/b,c.pdf"
+    assert recorder.failed == []
+    assert ingestion_queue.pending_count() == 0
+    with open(journal) as f:
+        assert f.read() == ""
+
+
+def test_submitted_job_survives_restart(journal):
+    first = IngestionQueue(journal, Recorder(expected=1).process)
+    first.load()
+    job = first.submit(8, "F8", "downloads/d.pdf", SUBMITTED_AT, contest_id="phys")
+
+    recorder = Recorder(expected=1)
+    restarted = IngestionQueue(journal, recorder.process, workers=1)
+    restarted.load()
+    drain(restarted, recorder)
+    assert recorder.processed == [job]
+
+
+def test_non_retryable_error_skips_retries(journal, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ingestion.time, "sleep", sleeps.append)
+    error = ValueError("файл слишком большой")
+    recorder = Recorder(expected=1, errors=[error])
+    ingestion_queue = IngestionQueue(journal, recorder.process, recorder.on_failure, workers=1,
+                                     non_retryable=(ValueError,))
+    ingestion_queue.load()
+    job = ingestion_queue.submit(9, "F9", "downloads/e.pdf", SUBMITTED_AT)
+
+    drain(ingestion_queue, recorder)
+    assert recorder.calls == 1 and sleeps == []
+    assert recorder.failed == [(job, error)]
+    assert ingestion_queue.pending_count() == 0
+
+
+def test_retryable_error_is_retried(journal, monkeypatch):
+    monkeypatch.setattr(ingestion.time, "sleep", lambda seconds: None)
+    recorder = Recorder(expected=1, errors=[OSError("сеть"), OSError("сеть")])
+    ingestion_queue = IngestionQueue(journal, recorder.process, recorder.on_failure, workers=1,
+                                     non_retryable=(ValueError,))
+    ingestion_queue.load()
+    job = ingestion_queue.submit(10, "F10", "downloads/f.pdf", SUBMITTED_AT)
+
+    drain(ingestion_queue, recorder)
+    assert recorder.calls == 3
+    assert recorder.processed == [job] and recorder.failed == []
@@ -0,0 +1,81 @@
+import asyncio
+import dataclasses
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+
+import bcrypt
+import pytest
+import telebot
+
+import ol_async
+from config import BotConfig, ConfigError, ContestConfig
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return BotConfig(bot_token="1:fake", register_password_hash=bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode(),
+                     olympiad_start=datetime.datetime(2020, 1, 1),
+                     olympiad_end=datetime.datetime(2099, 1, 1)).validate()
+
+
+def test_import_does_no_io(tmp_path):
+    subprocess.run([sys.executable, "-c", "import ol_async"], cwd=tmp_path, check=True,
+                   env={**os.environ, "PYTHONPATH": ROOT})
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("changes", [
+    lambda config: {"contests": (ContestConfig.from_defaults(config, "math9"),)},
+    lambda config: {"shards": 2},
+    lambda config: {"admin_mode": "password"},
+    lambda config: {"run_mode": "webhook"},
+])
+def test_unsupported_settings_are_rejected(config, changes):
+    with pytest.raises(ConfigError):
+        ol_async.check_supported(dataclasses.replace(config, **changes(config)))
+
+
+def start_bot(config, replies):
+    ol_async.registered_users.clear()
+    ol_async.setup(config)
+
+    async def reply_to(message, text, **kwargs):
+        replies.append(text)
+
+    ol_async.bot.reply_to = reply_to
+
+
+def stop_bot():
+    ol_async.io_executor.shutdown(wait=True)
+    ol_async.user_store.close()
+    ol_async.conversations.close()
+
+
+def send(text, counter=[0]):
+    counter[0] += 1
+    message = {"message_id": counter[0], "date": int(time.time()), "chat": {"id": 5, "type": "private"},
+               "from": {"id": 5, "is_bot": False, "first_name": "alice", "username": "alice"}, "text": text}
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    update = telebot.types.Update.de_json(json.dumps({"update_id": counter[0], "message": message}))
+    asyncio.run(ol_async.bot.process_new_updates([update]))
+
+
+def test_conversation_survives_restart(config):
+    replies = []
+    start_bot(config, replies)
+    send("/register")
+    stop_bot()
+
+    start_bot(config, replies)
+    send("pw")
+    stop_bot()
+    assert replies[0] == "Введите пароль, который дал организатор:"
+    assert replies[1].startswith("Вы успешно зарегистрировались")
@@ -0,0 +1,34 @@
+import pytest
+
+from participants import Participant, ParticipantTable, parse_code
+
+
+@pytest.mark.parametrize("text, code", [
+    ("12345", 12345),
+    (" 00042\n", 42),
+    ("", None),
+    (None, None),
+    ("12a", None),
+    ("-1", None),
+    ("²", None),
+    ("1²", None),
+    ("١٢٣", None),
+])
+def test_parse_code(text, code):
+    assert parse_code(text) == code
+
+
+def test_flags():
+    data = Participant()
+    data.registered = True
+    data.timer_active = True
+    data.timer_active = False
+    assert (data.registered, data.solution_sent, data.timer_active) == (True, False, False)
+
+
+def test_snapshot_is_a_copy():
+    table = ParticipantTable(stripes=4)
+    table[1] = Participant(code=1)
+    (user_id, data), = table.snapshot()
+    data.code = 2
+    assert table[1].code == 1
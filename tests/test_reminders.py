@@ -0,0 +1,31 @@
+import threading
+
+from reminders import ReminderSender
+
+
+def test_stop_sends_queued_messages():
+    sent = []
+    first_sent = threading.Event()
+    release = threading.Event()
+
+    def send(chat_id, text):
+        sent.append((chat_id, text))
+        first_sent.set()
+        release.wait(5)  # Первое сообщение задерживает поток, пока второе стоит в очереди
+
+    sender = ReminderSender(send)
+    sender.start()
+    sender.submit(1, "Таймер (работающий): 00:01:00")
+    assert first_sent.wait(5)
+    sender.submit(2, "Время вышло")
+    threading.Timer(0.1, release.set).start()
+    sender.stop()
+    assert sent == [(1, "Таймер (работающий): 00:01:00"), (2, "Время вышло")]
+
+
+def test_stop_without_start_sends_queued_messages():
+    sent = []
+    sender = ReminderSender(lambda chat_id, text: sent.append((chat_id, text)))
+    sender.submit(3, "Время вышло")
+    sender.stop()
+    assert sent == [(3, "Время вышло")]
@@ -0,0 +1,76 @@
+import datetime
+import struct
+import zlib
+
+import pytest
+
+from participants import MAX_POINTS, REGISTERED, SOLUTION_SENT, TIMER_ACTIVE, Participant, parse_points
+from snapshot import (_HEADER, _RECORDS, NO_TIME, SNAPSHOT_MAGIC, SnapshotFormatError, pack_snapshot,
+                      read_snapshot, unpack_snapshot, write_snapshot)
+from storage import JournalStore
+
+
+def test_round_trip_boundaries():
+    users = [
+        (1, Participant()),
+        (-2 ** 63, Participant(code=0, points=-MAX_POINTS)),
+        (2 ** 63 - 1, Participant(code=2 ** 31 - 1, flags=REGISTERED | SOLUTION_SENT | TIMER_ACTIVE,
+                                  solution_time=datetime.datetime(2025, 3, 4, 8, 0, 0, 123456),
+                                  points=MAX_POINTS, username="alice")),
+        (3, Participant(code=12345, points=3000000000, username="")),
+        (4, Participant(solution_time=datetime.datetime(1969, 12, 31, 23, 59, 59), username="юзер")),
+    ]
+    assert unpack_snapshot(pack_snapshot(users)) == dict(users)
+
+
+def test_empty_snapshot():
+    assert unpack_snapshot(pack_snapshot([])) == {}
+
+
+@pytest.mark.parametrize("data", [
+    Participant(points=MAX_POINTS + 1),
+    Participant(points=-MAX_POINTS - 2),
+    Participant(code=2 ** 31),
+])
+def test_out_of_range_is_format_error(data):
+    with pytest.raises(SnapshotFormatError):
+        pack_snapshot([(1, data)])
+
+
+def test_reads_version_1():
+    body = _RECORDS[1].pack(7, 555, REGISTERED, NO_TIME, 20, True) + "bob".encode("utf-8")
+    buffer = _HEADER.pack(SNAPSHOT_MAGIC, 1, 1, zlib.crc32(body)) + body
+    assert unpack_snapshot(buffer) == {7: Participant(code=555, flags=REGISTERED, points=20, username="bob")}
+
+
+@pytest.mark.parametrize("damage", [
+    lambda buffer: buffer[:-1],
+    lambda buffer: b"XXXX" + buffer[4:],
+    lambda buffer: buffer[:4] + struct.pack("<H", 99) + buffer[6:],
+    lambda buffer: buffer[:-1] + bytes([buffer[-1] ^ 1]),
+])
+def test_damaged_snapshot(damage):
+    buffer = pack_snapshot([(1, Participant(code=1, username="a"))])
+    with pytest.raises(SnapshotFormatError):
+        unpack_snapshot(damage(buffer))
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / "users.snapshot")
+    users = [(5, Participant(code=11111, flags=REGISTERED, points=3000000000, username="big"))]
+    write_snapshot(path, users)
+    assert read_snapshot(path) == dict(users)
+
+
+def test_journal_keeps_large_points(tmp_path):
+    store = JournalStore(str(tmp_path / "s"), str(tmp_path / "j"), compact_every=1)
+    store.load()
+    store.save_user(1, Participant(code=10000, flags=REGISTERED, points=3000000000, username="x"))
+    store.close()
+    assert JournalStore(str(tmp_path / "s"), str(tmp_path / "j")).load()[1].points == 3000000000
+
+
+def test_parse_points_rejects_out_of_range():
+    assert parse_points("@x - [20] балл") == ("x", 20)
+    with pytest.raises(ValueError):
+        parse_points(f"@x - [{MAX_POINTS + 1}] балл")
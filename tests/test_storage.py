@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+
+from participants import REGISTERED, SOLUTION_SENT, Participant
+from snapshot import SnapshotFormatError
+from storage import JournalStore, SQLiteStore, UserStore, create_user_store
+
+
+def test_incomplete_store_fails_at_construction():
+    class IncompleteStore(UserStore):
+        def load(self):
+            return {}
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
+
+
+@pytest.mark.parametrize("backend", ["journal", "sqlite"])
+def test_apply_changes_round_trip(tmp_path, backend):
+    paths = [str(tmp_path / name) for name in ("users.snapshot", "users.journal", "users.db")]
+    store = create_user_store(backend, *paths)
+    store.load()
+    alice = Participant(code=12345, flags=REGISTERED | SOLUTION_SENT, points=20, username="alice",
+                        solution_time=datetime.datetime(2025, 3, 4, 8, 30))
+    store.apply_changes([(1, alice), (2, Participant(code=23456, username="bob")), (2, None)])
+    assert store.users_with_solutions() == [(1, 12345)]
+    assert store.users_with_points() == [(1, 20)]
+    store.close()
+
+    store = create_user_store(backend, *paths)
+    assert store.load() == {1: alice}
+    store.close()
+    assert isinstance(store, JournalStore if backend == "journal" else SQLiteStore)
+
+
+def write_journal(tmp_path, lines):
+    store = JournalStore(str(tmp_path / "users.snapshot"), str(tmp_path / "users.journal"))
+    store.load()
+    store.apply_changes([(1, Participant(code=11111, username="a")), (2, Participant(code=22222, username="b")),
+                         (3, Participant(code=33333, username="c"))])
+    store.close()
+    journal = (tmp_path / "users.journal").read_text().splitlines(keepends=True)
+    (tmp_path / "users.journal").write_text("".join(lines(journal)))
+    return JournalStore(str(tmp_path / "users.snapshot"), str(tmp_path / "users.journal"))
+
+
+def test_torn_last_journal_line_is_skipped(tmp_path):
+    store = write_journal(tmp_path, lambda journal: journal[:2] + [journal[2][:7]])
+    assert sorted(store.load()) == [1, 2]
+
+
+def test_corrupt_middle_journal_line_is_rejected(tmp_path):
+    store = write_journal(tmp_path, lambda journal: [journal[0], "U,2,garbage\n", journal[2]])
+    journal_before = (tmp_path / "users.journal").read_text()
+    with pytest.raises(SnapshotFormatError):
+        store.load()
+    assert (tmp_path / "users.journal").read_text() == journal_before
@@ -0,0 +1,101 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from webhook_server import SECRET_TOKEN_HEADER, WebhookServer, update_sender_id
+
+SECRET = "s3cret"
+
+
+def make_update(update_id, user_id=5):
+    return {"update_id": update_id, "message": {"message_id": update_id, "from": {"id": user_id}, "text": "hi"}}
+
+
+@pytest.fixture
+def received():
+    return []
+
+
+def start_server(handle_update, **kwargs):
+    server = WebhookServer(handle_update, port=0, path="/webhook", secret_token=SECRET, **kwargs)
+    server.start()
+    return server
+
+
+def post(server, body, path="/webhook", secret=SECRET):
+    host, port = server.server_address
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    headers = {"Content-Type": "application/json"}
+    if secret is not None:
+        headers[SECRET_TOKEN_HEADER] = secret
+    connection.request("POST", path, body=body if isinstance(body, bytes) else json.dumps(body).encode(),
+                       headers=headers)
+    status = connection.getresponse().status
+    connection.close()
+    return status
+
+
+@pytest.fixture
+def server(received):
+    done = threading.Event()
+
+    def handle_update(body):
+        received.append(json.loads(body))
+        done.set()
+
+    server = start_server(handle_update)
+    server.done = done
+    yield server
+    server.stop()
+
+
+def test_good_update_is_handled(server, received):
+    assert post(server, make_update(1)) == 200
+    assert server.done.wait(5)
+    assert received == [make_update(1)]
+
+
+def test_wrong_secret(server, received):
+    assert post(server, make_update(1), secret="wrong") == 403
+    assert post(server, make_update(2), secret=None) == 403
+    assert received == []
+
+
+def test_wrong_path(server):
+    assert post(server, make_update(1), path="/other") == 404
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"\xff\xfe", b"[]", b"null", b"1", b'"text"'])
+def test_malformed_body(server, received, body):
+    assert post(server, body) == 400
+    assert received == []
+
+
+def test_full_queue_returns_503():
+    release = threading.Event()
+    started = threading.Event()
+
+    def handle_update(body):
+        started.set()
+        release.wait(5)
+
+    server = start_server(handle_update, workers=1, queue_size=1)
+    try:
+        assert post(server, make_update(1)) == 200
+        assert started.wait(5)  # Поток занят первым обновлением
+        assert post(server, make_update(2)) == 200  # Второе ждет в очереди
+        assert post(server, make_update(3)) == 503
+    finally:
+        release.set()
+        server.stop()
+
+
+@pytest.mark.parametrize("update, sender", [
+    (make_update(1, user_id=42), 42),
+    ({"update_id": 7, "message": "oops"}, 7),
+    ({"update_id": 8, "message": {"from": None}}, 8),
+])
+def test_update_sender_id(update, sender):
+    assert update_sender_id(update) == sender
@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+
+# --- Min-heap дедлайнов с ленивым удалением отмененных записей ---
+class _DeadlineHeap:
+    def __init__(self):
+        self._heap = []  # [(when, seq, key, callback)]
+        self._entries = {}  # {key: seq} - актуальная запись для ключа, остальные считаются отмененными
+        self._counter = itertools.count()
+
+    # Возвращает True, если новая запись стала ближайшей
+    def _push(self, key, when, callback):
+        seq = next(self._counter)
+        self._entries[key] = seq
+        heapq.heappush(self._heap, (when, seq, key, callback))
+        self._compact()
+        return self._heap[0][1] == seq
+
+    def _discard(self, key):
+        return self._entries.pop(key, None) is not None
+
+    # Снимает с кучи ближайшую наступившую запись: (key, callback, None) или (None, None, задержка до ближайшей)
+    def _pop_due(self):
+        while self._heap:
+            when, seq, key, callback = self._heap[0]
+            if self._entries.get(key) != seq:
+                heapq.heappop(self._heap)
+                continue
+            delay = when - time.time()
+            if delay > 0:
+                return None, None, delay
+            heapq.heappop(self._heap)
+            del self._entries[key]
+            return key, callback, None
+        return None, None, None
+
+    # Отмененные записи удаляются лениво; пересобираем кучу, когда их становится слишком много
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if self._entries.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+
+
+# --- Планировщик таймеров: один поток и min-heap дедлайнов ---
+class TimerScheduler(_DeadlineHeap):
+    def __init__(self):
+        super().__init__()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="timer-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # Планирует вызов callback в момент when (timestamp). Повторный вызов с тем же ключом заменяет запись.
+    def schedule(self, key, when, callback):
+        with self._condition:
+            # Будим поток, только если новая запись стала ближайшей
+            if self._push(key, when, callback):
+                self._condition.notify()
+
+    # Планирует много записей [(key, when, callback)] за один захват блокировки
+    def schedule_many(self, entries):
+        with self._condition:
+            for key, when, callback in entries:
+                self._push(key, when, callback)
+            self._condition.notify()
+
+    def cancel(self, key):
+        with self._condition:
+            return self._discard(key)
+
+    def is_scheduled(self, key):
+        with self._condition:
+            return key in self._entries
+
+    def __len__(self):
+        with self._condition:
+            return len(self._entries)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    key, callback, delay = self._pop_due()
+                    if callback is not None:
+                        break
+                    self._condition.wait(delay)
+                else:
+                    return
+            try:
+                callback()
+            except Exception as e:
+                print(f"Ошибка в обработчике таймера {key}: {e}")
+
+
+# --- Асинхронный планировщик: та же куча, ожидание и обработчики в цикле событий asyncio ---
+# callback - функция без аргументов, возвращающая корутину. Каждый сработавший таймер
+# запускается отдельной задачей, поэтому медленная отправка не задерживает остальные.
+class AsyncTimerScheduler(_DeadlineHeap):
+    def __init__(self):
+        super().__init__()
+        self._wakeup = None
+        self._task = None
+        self._callbacks = set()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def schedule(self, key, when, callback):
+        if self._push(key, when, callback) and self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self, key):
+        return self._discard(key)
+
+    def is_scheduled(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def _run(self):
+        while True:
+            key, callback, delay = self._pop_due()
+            if callback is not None:
+                task = asyncio.get_running_loop().create_task(self._invoke(key, callback))
+                self._callbacks.add(task)
+                task.add_done_callback(self._callbacks.discard)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _invoke(self, key, callback):
+        try:
+            await callback()
+        except Exception as e:
+            print(f"Ошибка в обработчике таймера {key}: {e}")
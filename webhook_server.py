@@ -0,0 +1,113 @@
+import http.server
+import json
+import queue
+import threading
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+# --- Ключ для распределения обновлений: id отправителя (порядок сообщений одного пользователя сохраняется) ---
+def update_sender_id(update):
+    for field in ("message", "edited_message", "callback_query", "inline_query", "my_chat_member"):
+        payload = update.get(field)
+        if isinstance(payload, dict) and isinstance(payload.get("from"), dict) and "id" in payload["from"]:
+            return payload["from"]["id"]
+    return update.get("update_id", 0)
+
+
+# --- Локальный HTTP-сервер для webhook ---
+# handle_update получает JSON-строку обновления Telegram. Обновления раскладываются по workers
+# очередям по id отправителя, каждую очередь разбирает свой поток. Если очередь переполнена,
+# сервер отвечает 503 и Telegram повторит доставку позже.
+class WebhookServer:
+    def __init__(self, handle_update, host="127.0.0.1", port=8443, path="/webhook", secret_token=None,
+                 workers=8, queue_size=1000):
+        self.handle_update = handle_update
+        self.path = path
+        self.secret_token = secret_token
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._workers = []
+        self._serve_thread = None
+        self._httpd = http.server.ThreadingHTTPServer((host, port), self._make_request_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def server_address(self):
+        return self._httpd.server_address
+
+    def _make_request_handler(self):
+        server = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    self.send_error(404)
+                    return
+                if server.secret_token is not None and self.headers.get(SECRET_TOKEN_HEADER) != server.secret_token:
+                    self.send_error(403)
+                    return
+                try:
+                    body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+                    update = json.loads(body)
+                except (ValueError, UnicodeDecodeError):
+                    self.send_error(400)
+                    return
+                if not isinstance(update, dict):  # Корректный JSON, но не объект обновления ([], null, 1)
+                    self.send_error(400)
+                    return
+                if not server.enqueue(update, body):
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass  # Не засоряем stderr строкой на каждое обновление
+
+        return RequestHandler
+
+    def enqueue(self, update, body):
+        worker_queue = self._queues[hash(update_sender_id(update)) % len(self._queues)]
+        try:
+            worker_queue.put_nowait(body)
+        except queue.Full:
+            print(f"Очередь обработки обновлений переполнена, обновление {update.get('update_id')} отклонено")
+            return False
+        return True
+
+    def _worker(self, worker_queue):
+        while True:
+            body = worker_queue.get()
+            if body is None:
+                return
+            try:
+                self.handle_update(body)
+            except Exception as e:
+                print(f"Ошибка при обработке обновления: {e}")
+
+    def _start_workers(self):
+        for worker_queue in self._queues:
+            worker = threading.Thread(target=self._worker, args=(worker_queue,), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    # Блокирующий запуск (основной режим работы бота)
+    def serve_forever(self):
+        self._start_workers()
+        self._httpd.serve_forever()
+
+    # Запуск в фоновом потоке (например, для проверки с локальным источником обновлений)
+    def start(self):
+        self._start_workers()
+        self._serve_thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._serve_thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for worker_queue in self._queues:
+            worker_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []